@@ -0,0 +1,11 @@
+# __main__.py
+# 支持在仓库根目录执行 `python -m backend serve`。
+# backend 中的模块以顶层模块的方式互相导入（与 `fastapi dev main.py` 一致），所以先把本目录加入 sys.path。
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from server import main  # noqa: E402
+
+sys.exit(main())
@@ -0,0 +1,87 @@
+# async_db.py
+"""
+基于 aiosqlite 的异步数据库访问，供 OAuth / 登录等热路径在事件循环上直接查询。
+
+同步处理函数在等待 SQLite 时会占用 Starlette 线程池（默认 40 个线程）中的一个线程，
+并发的 SSO 跳转数因此受线程池大小限制。这里维护一个小的 aiosqlite 连接池（每个连接一个后台线程），
+请求在等待数据库时只挂起协程，不占用线程池。
+
+SQL 仍由 peewee 模型生成：`query.sql()` 得到 SQL 和参数后交给 aiosqlite 执行，
+表结构、字段转换和方言与同步代码保持一致。
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import profiling
+from db import SQLITE_PRAGMAS, db
+
+ASYNC_DB_POOL_SIZE = int(os.environ.get("SSO_ASYNC_DB_POOL", "4"))
+
+
+class AsyncDatabase:
+    def __init__(self, size: int = ASYNC_DB_POOL_SIZE):
+        self.size = size
+        self._connections = []
+        self._idle: asyncio.Queue | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._idle is not None
+
+    async def open(self, path: str | None = None):
+        """打开连接池。在应用 lifespan 中调用；默认使用同步 db 已初始化的数据库文件。"""
+        import aiosqlite
+
+        path = path or db.database
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            # isolation_level=None：单条语句自动提交，不隐式开启事务
+            conn = await aiosqlite.connect(path, timeout=10, isolation_level=None)
+            for key, value in SQLITE_PRAGMAS.items():
+                await conn.execute(f"PRAGMA {key} = {value}")
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._idle = None
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._idle is None:
+            raise RuntimeError("Async database pool is not open")
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def execute_sql(self, sql: str, params=()) -> tuple[list[tuple], int]:
+        """执行一条语句，返回 (结果行, 受影响行数)。"""
+        async with self.connection() as conn:
+            start = time.perf_counter()
+            try:
+                async with conn.execute(sql, params) as cursor:
+                    rows = await cursor.fetchall()
+                    return rows, cursor.rowcount
+            finally:
+                profiling.record(sql, time.perf_counter() - start)
+
+    async def fetchall(self, query) -> list[tuple]:
+        rows, _ = await self.execute_sql(*query.sql())
+        return rows
+
+    async def fetchone(self, query) -> tuple | None:
+        rows, _ = await self.execute_sql(*query.sql())
+        return rows[0] if rows else None
+
+    async def execute(self, query) -> int:
+        _, rowcount = await self.execute_sql(*query.sql())
+        return rowcount
+
+
+adb = AsyncDatabase()
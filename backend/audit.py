@@ -0,0 +1,133 @@
+# audit.py
+"""
+登录与授权审计日志。
+
+登录、授权和令牌交换都在热路径上，记录事件时只追加到进程内的环形缓冲区，不访问数据库；
+lifespan 启动的后台任务定期把缓冲区中的事件以批量 INSERT 写入只追加的 AuditEvent 表，
+每次写入一个事务。缓冲区写满时丢弃最旧的事件并在日志中告警，不会让请求等待。
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from fastapi import Request
+
+from db import db
+from models import AuditEvent
+
+# 事件类型
+LOGIN = "login"
+ADMIN_LOGIN = "admin_login"
+AUTHORIZE = "authorize"
+TOKEN = "token"
+
+AUDIT_BUFFER_SIZE = int(os.environ.get("AUDIT_BUFFER_SIZE", "10000"))
+FLUSH_INTERVAL_SECONDS = 2
+FLUSH_BATCH_SIZE = 500
+
+logger = logging.getLogger("uvicorn.error")
+
+_buffer: deque = deque(maxlen=AUDIT_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_dropped = 0
+
+
+def client_ip(request: Request) -> str | None:
+    return request.client.host if request.client else None
+
+
+def record(event: str, success: bool = True, username: str | None = None,
+           client_id: str | None = None, ip_address: str | None = None, detail: str | None = None):
+    """把一条事件追加到缓冲区，不访问数据库。"""
+    global _dropped
+    row = {
+        "created_at": datetime.utcnow(),
+        "event": event,
+        "success": success,
+        "username": username,
+        "client_id": client_id,
+        "ip_address": ip_address,
+        "detail": detail,
+    }
+    with _buffer_lock:
+        if len(_buffer) == _buffer.maxlen:
+            _dropped += 1
+        _buffer.append(row)
+
+
+def flush():
+    """把缓冲区中的事件写入数据库。写入失败时事件放回缓冲区头部，下次再试。"""
+    global _dropped
+    with _buffer_lock:
+        rows = list(_buffer)
+        _buffer.clear()
+        dropped, _dropped = _dropped, 0
+    if dropped:
+        logger.warning("Audit buffer overflowed, %d events dropped", dropped)
+    if not rows:
+        return
+    try:
+        with db.connection_context(), db.atomic():
+            for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+                AuditEvent.insert_many(rows[start:start + FLUSH_BATCH_SIZE]).execute()
+    except Exception:
+        with _buffer_lock:
+            # 放回的旧事件排在新事件之前；超出容量时 deque 从另一端丢弃，保留最旧的未写入事件
+            _buffer.extendleft(reversed(rows))
+        raise
+
+
+async def run_flusher(interval: float = FLUSH_INTERVAL_SECONDS):
+    """lifespan 中启动的后台任务：定期批量写入审计事件，被取消时再写入一次。"""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(flush)
+            except Exception:
+                logger.exception("Failed to flush audit events")
+    finally:
+        await asyncio.to_thread(flush)
+
+
+def encode_cursor(row: dict) -> str:
+    return f"{row['created_at'].isoformat()}_{row['id']}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, _, event_id = cursor.rpartition("_")
+    return datetime.fromisoformat(created_at), int(event_id)
+
+
+def query(start: datetime | None = None, end: datetime | None = None, event: str | None = None,
+          username: str | None = None, client_id: str | None = None, success: bool | None = None,
+          cursor: str | None = None, limit: int = 100) -> list[dict]:
+    """
+    按时间倒序查询事件。cursor 是上一页最后一条事件的 encode_cursor()，
+    按 (created_at, id) 做键集翻页，翻页深度不影响查询开销。
+    """
+    conditions = []
+    if start:
+        conditions.append(AuditEvent.created_at >= start)
+    if end:
+        conditions.append(AuditEvent.created_at < end)
+    if event:
+        conditions.append(AuditEvent.event == event)
+    if username:
+        conditions.append(AuditEvent.username == username)
+    if client_id:
+        conditions.append(AuditEvent.client_id == client_id)
+    if success is not None:
+        conditions.append(AuditEvent.success == success)
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        conditions.append((AuditEvent.created_at < created_at)
+                          | ((AuditEvent.created_at == created_at) & (AuditEvent.id < event_id)))
+
+    select = AuditEvent.select()
+    if conditions:
+        select = select.where(*conditions)
+    return list(select.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit).dicts())
@@ -0,0 +1,9 @@
+# benchmarks/__init__.py
+"""
+SSO 后端的进程内基准测试套件。
+
+在 backend 目录下运行：
+
+    python -m benchmarks --users 1000 --save benchmarks/baseline.json
+    python -m benchmarks --compare benchmarks/baseline.json
+"""
@@ -0,0 +1,93 @@
+# benchmarks/__main__.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+
+import httpx
+
+from benchmarks.harness import (
+    SeedConfig, seed_database, run_scenario, build_report, print_results, save_report, compare_reports,
+)
+from benchmarks.sso_flow import BenchContext, setup_context, build_scenarios
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="SSO backend benchmark suite")
+    parser.add_argument("--users", type=int, default=1000, help="number of seeded SSO users")
+    parser.add_argument("--departments", type=int, default=50, help="number of seeded departments")
+    parser.add_argument("--clients", type=int, default=5, help="number of seeded client apps")
+    parser.add_argument("--iterations", type=int, default=200, help="base iterations per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent in-flight requests")
+    parser.add_argument("--import-rows", type=int, default=5, help="rows per uploaded user import file")
+    parser.add_argument("--only", nargs="*", help="run only the named scenarios")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--db", help="SQLite file to use (defaults to a temporary file)")
+    parser.add_argument("--save", metavar="PATH", help="write the JSON report to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative latency/throughput drift before flagging a regression")
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    config = SeedConfig(users=args.users, departments=args.departments, clients=args.clients, seed=args.seed)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="sso-bench-"), "bench.db")
+    print(f"Seeding {db_path}: {config.users} users, {config.departments} departments, {config.clients} clients")
+    seed = seed_database(db_path, config)
+
+    # 应用的 lifespan 会按 SSO_DB_PATH 初始化数据库
+    os.environ["SSO_DB_PATH"] = db_path
+    from main import app
+
+    # ASGITransport 不会触发 lifespan，这里手动进入
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://sso.bench") as http:
+        ctx = BenchContext(http=http, seed=seed, rnd=random.Random(args.seed), import_rows=args.import_rows)
+        await setup_context(ctx)
+
+        results = []
+        for scenario in build_scenarios():
+            if args.only and scenario.name not in args.only:
+                continue
+            result = await run_scenario(scenario, ctx, args.iterations, args.concurrency)
+            results.append(result)
+
+    print_results(results)
+    return build_report({
+        "users": config.users,
+        "departments": config.departments,
+        "clients": config.clients,
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "import_rows": args.import_rows,
+    }, results)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    if args.save:
+        save_report(report, args.save)
+        print(f"\nReport saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# benchmarks/concurrency.py
+"""
+高并发下的 OAuth 热路径基准。
+
+与进程内的 `python -m benchmarks` 不同，这里在子进程中启动真实的 uvicorn 服务器，
+用 --concurrency 个并发 HTTP 连接（默认 500）驱动 /authorize、/token、/api/me，
+用来观察这些接口在并发数远超线程池大小（40）时的吞吐和尾延迟。
+
+    python -m benchmarks.concurrency --concurrency 500 --iterations 2000
+
+服务器运行在另一个进程中，报告中的 q/op 一列恒为 0。
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import SeedConfig, seed_database, run_scenario, print_results
+from benchmarks.sso_flow import BenchContext, setup_context, build_scenarios
+from server import BACKEND_DIR, detect_loop, detect_http
+
+SCENARIOS = ["authorize", "token", "me", "me_not_modified"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, SSO_DB_PATH=db_path)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--loop", detect_loop(), "--http", detect_http(),
+         "--backlog", "4096", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while True:
+            try:
+                await http.get("/openapi.json")
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("server did not start in time")
+                await asyncio.sleep(0.2)
+
+
+async def run(args):
+    config = SeedConfig(users=args.users, departments=args.departments, clients=args.clients, seed=args.seed)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="sso-bench-"), "bench.db")
+    print(f"Seeding {db_path}: {config.users} users, {config.departments} departments, {config.clients} clients")
+    seed = seed_database(db_path, config)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(db_path, port, args.workers)
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+            ctx = BenchContext(http=http, seed=seed, rnd=random.Random(args.seed))
+            await setup_context(ctx)
+            print(f"Driving {base_url} with {args.concurrency} concurrent connections, {args.workers} worker(s)")
+            results = []
+            for scenario in build_scenarios():
+                if scenario.name in (args.only or SCENARIOS):
+                    results.append(await run_scenario(scenario, ctx, args.iterations, args.concurrency))
+        print_results(results)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.concurrency")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--departments", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=500, help="concurrent HTTP connections")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--only", nargs="*", help=f"scenarios to run (default: {' '.join(SCENARIOS)})")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    return 1 if any(r.errors for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# benchmarks/harness.py
+"""基准测试的通用部分：数据库播种、SQL 计数、计时与结果汇总。"""
+import asyncio
+import json
+import platform
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from passlib.context import CryptContext
+
+import profiling
+from db import db, init_db
+import stats
+from models import User, Client, ClientRedirectURI, ClientOrigin, AuthCode, AdminUser, Department, Setting, StatCounter, AuditEvent
+
+ALL_MODELS = [User, AdminUser, Client, ClientRedirectURI, ClientOrigin, AuthCode, Department, Setting, StatCounter, AuditEvent]
+
+# 所有播种用户共用同一个密码，只需计算一次 bcrypt 哈希
+SEED_PASSWORD = "password123"
+ADMIN_USERNAME = "bench.admin"
+ADMIN_PASSWORD = "adminpass"
+BATCH_SIZE = 500
+
+
+@dataclass
+class SeedConfig:
+    users: int = 1000
+    departments: int = 50
+    clients: int = 5
+    seed: int = 42
+
+
+def seed_database(path: str, config: SeedConfig) -> dict:
+    """在 path 处重建数据库并写入可配置规模的部门、用户和客户端。"""
+    rnd = random.Random(config.seed)
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    init_db(path)
+    db.connect(reuse_if_open=True)
+    db.drop_tables(ALL_MODELS, safe=True)
+    db.create_tables(ALL_MODELS)
+
+    with db.atomic():
+        # 部门按顺序创建，父部门总是在之前已创建的部门中随机挑选，形成一棵树
+        department_ids = []
+        for i in range(config.departments):
+            parent_id = rnd.choice(department_ids) if department_ids and rnd.random() < 0.8 else None
+            dept = Department.create(
+                name=f"Department {i:04d}",
+                description=f"Seeded department {i}",
+                parent_id=parent_id,
+            )
+            department_ids.append(dept.id)
+
+        hashed_password = pwd_context.hash(SEED_PASSWORD)
+        rows = [
+            {
+                "username": f"user{i:06d}",
+                "full_name": f"User {i}",
+                "email": f"user{i:06d}@example.com",
+                "hashed_password": hashed_password,
+                "department": rnd.choice(department_ids) if department_ids and rnd.random() < 0.9 else None,
+            }
+            for i in range(config.users)
+        ]
+        for start in range(0, len(rows), BATCH_SIZE):
+            User.insert_many(rows[start:start + BATCH_SIZE]).execute()
+        stats.rebuild_user_counters()
+
+        clients = []
+        for i in range(config.clients):
+            client = Client.create(
+                client_id=f"bench_client_{i}",
+                client_secret=f"bench_client_{i}_secret",
+                redirect_uri=f"http://client{i}.bench.local/api/auth/callback",
+            )
+            clients.append({
+                "client_id": client.client_id,
+                "client_secret": client.client_secret,
+                "redirect_uri": client.redirect_uri,
+            })
+
+        AdminUser.create(
+            username=ADMIN_USERNAME,
+            full_name="Benchmark Admin",
+            email="bench.admin@sso.local",
+            hashed_password=pwd_context.hash(ADMIN_PASSWORD),
+        )
+        Setting.insert_many([
+            {"key": "session_duration_admin_hours", "value": "8"},
+            {"key": "password_min_length", "value": "8"},
+            {"key": "password_require_uppercase", "value": "true"},
+        ]).execute()
+
+    db.close()
+    return {
+        "usernames": [row["username"] for row in rows],
+        "clients": clients,
+        "department_names": [f"Department {i:04d}" for i in range(config.departments)],
+    }
+
+
+@dataclass
+class Scenario:
+    """
+    一个基准场景。
+
+    prepare 在计时区间之外按迭代依次执行，其返回值作为 run 的参数；
+    只有 run 会被计时并统计 SQL。scale 用于缩放迭代次数（例如 bcrypt 较慢的登录场景）。
+    """
+    name: str
+    run: Callable[[Any, Any], Awaitable[None]]
+    prepare: Callable[[Any, int], Awaitable[Any]] | None = None
+    scale: float = 1.0
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    iterations: int
+    errors: int
+    throughput_rps: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_op: float
+    error_samples: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        data = self.__dict__.copy()
+        data.pop("error_samples")
+        return data
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """最近秩法计算百分位数，sorted_values 必须已排序。"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(scenario: Scenario, ctx: Any, iterations: int, concurrency: int) -> ScenarioResult:
+    iterations = max(1, int(iterations * scenario.scale))
+
+    states = []
+    for i in range(iterations):
+        states.append(await scenario.prepare(ctx, i) if scenario.prepare else None)
+
+    latencies: list[float] = []
+    errors: list[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(state):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await scenario.run(ctx, state)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    with profiling.profile() as counter:
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(state) for state in states))
+        wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return ScenarioResult(
+        name=scenario.name,
+        iterations=iterations,
+        errors=len(errors),
+        throughput_rps=round(iterations / wall, 2) if wall else 0.0,
+        mean_ms=round(statistics.fmean(latencies), 3),
+        p50_ms=round(percentile(latencies, 50), 3),
+        p95_ms=round(percentile(latencies, 95), 3),
+        p99_ms=round(percentile(latencies, 99), 3),
+        queries_per_op=round(counter.count / iterations, 2),
+        error_samples=errors[:3],
+    )
+
+
+def build_report(config: dict, results: list[ScenarioResult]) -> dict:
+    return {
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scenarios": {r.name: r.to_dict() for r in results},
+    }
+
+
+def print_results(results: list[ScenarioResult]):
+    header = f"{'scenario':<28}{'iters':>7}{'err':>5}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/op':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.name:<28}{r.iterations:>7}{r.errors:>5}{r.throughput_rps:>10.1f}"
+              f"{r.p50_ms:>10.2f}{r.p95_ms:>10.2f}{r.p99_ms:>10.2f}{r.queries_per_op:>8.1f}")
+        for sample in r.error_samples:
+            print(f"    ! {sample}")
+
+
+def save_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """
+    对比两份报告，返回超出容差的回归描述。
+    延迟(p95)上升或吞吐下降超过 tolerance 比例，或每次操作的 SQL 数增加，都视为回归。
+    """
+    regressions = []
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f}ms -> {cur['p95_ms']:.2f}ms")
+        if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']:.1f} -> {cur['throughput_rps']:.1f} rps")
+        if cur["queries_per_op"] > base["queries_per_op"]:
+            regressions.append(f"{name}: queries/op {base['queries_per_op']} -> {cur['queries_per_op']}")
+    return regressions
@@ -0,0 +1,150 @@
+# benchmarks/queries.py
+"""
+SQL 语句数预算检查。
+
+在播种好的数据库上逐个请求关键接口，用 profiling.assert_max_queries 检查每个请求执行的语句数。
+列表类接口的语句数不应随数据量增长；有人重新引入逐行的外键懒加载（N+1）时，这里的退出码为 1。
+
+    python -m benchmarks.queries
+    python -m benchmarks.queries --users 2000 --verbose
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import httpx
+
+import profiling
+from benchmarks.harness import SeedConfig, seed_database
+from benchmarks.sso_flow import (
+    BenchContext, setup_context, authorize, exchange_code, _admin_headers, _expect, SSO_SESSION_COOKIE,
+)
+
+# 接口 -> 单个请求允许执行的最多语句数（缓存预热后的稳定状态）
+BUDGETS = {
+    "authorize": 2,
+    "token": 3,
+    "me": 1,
+    "userinfo": 1,
+    "directory_lookup_50": 2,
+    "admin_users_page": 3,
+    "admin_departments_list": 2,
+    "admin_clients_list": 2,
+    "admin_user_stats": 3,
+    "admin_stats_timeseries": 5,
+    "admin_audit_page": 2,
+}
+
+
+def build_checks(ctx: BenchContext) -> dict:
+    """
+    返回 接口名 -> check(measure)。check 发出一次请求，只把被检查的那个请求放在 measure() 的上下文中
+    （/token、/userinfo 需要先走 /authorize 拿到授权码，这些准备请求不计入）。
+    """
+    sso_token = ctx.sso_tokens[0]
+    client = ctx.seed["clients"][0]
+    sso_cookie = {"Cookie": f"{SSO_SESSION_COOKIE}={sso_token}"}
+
+    async def authorize_only(measure):
+        with measure():
+            await authorize(ctx, sso_token, client)
+
+    async def token(measure):
+        code = await authorize(ctx, sso_token, client)
+        with measure():
+            await exchange_code(ctx, code, client)
+
+    async def userinfo(measure):
+        code = await authorize(ctx, sso_token, client)
+        access_token = await exchange_code(ctx, code, client)
+        with measure():
+            _expect(await ctx.http.get("/userinfo", headers={"Authorization": f"Bearer {access_token}"}), 200)
+
+    def get(path, headers=None, **kwargs):
+        async def check(measure):
+            with measure():
+                _expect(await ctx.http.get(path, headers=headers or _admin_headers(ctx), **kwargs), 200)
+        return check
+
+    client_auth = (client["client_id"], client["client_secret"])
+    return {
+        "authorize": authorize_only,
+        "token": token,
+        "me": get("/api/me", headers=sso_cookie),
+        "userinfo": userinfo,
+        "directory_lookup_50": get("/api/directory/users", headers={"Accept": "application/json"},
+                                   params={"username": ctx.seed["usernames"][:50]}, auth=client_auth),
+        "admin_users_page": get("/api/admin/users?page=2&page_size=100"),
+        "admin_departments_list": get("/api/admin/departments"),
+        "admin_clients_list": get("/api/admin/clients"),
+        "admin_user_stats": get("/api/admin/stats/users"),
+        "admin_stats_timeseries": get("/api/admin/stats/timeseries?days=30"),
+        "admin_audit_page": get("/api/admin/audit?limit=100"),
+    }
+
+
+async def run(args) -> list[str]:
+    config = SeedConfig(users=args.users, departments=args.departments, clients=args.clients, seed=args.seed)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="sso-bench-"), "bench.db")
+    print(f"Seeding {db_path}: {config.users} users, {config.departments} departments, {config.clients} clients")
+    seed = seed_database(db_path, config)
+
+    os.environ["SSO_DB_PATH"] = db_path
+    from main import app
+
+    violations = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://sso.bench") as http:
+        ctx = BenchContext(http=http, seed=seed, rnd=random.Random(args.seed))
+        await setup_context(ctx, session_pool=1)
+
+        print(f"\n{'endpoint':<26}{'queries':>8}{'budget':>8}{'db ms':>9}")
+        for name, check in build_checks(ctx).items():
+            await check(profiling.profile)  # 预热设置、版本号等进程内缓存
+            budget = BUDGETS[name]
+            profiles = []
+
+            @contextmanager
+            def measure():
+                with profiling.assert_max_queries(budget) as current:
+                    profiles.append(current)
+                    yield current
+
+            try:
+                await check(measure)
+                flag = ""
+            except AssertionError as exc:
+                violations.append(f"{name}: {exc}")
+                flag = "  OVER BUDGET"
+            profile = profiles[0]
+            print(f"{name:<26}{profile.count:>8}{budget:>8}{profile.total_ms:>9.2f}{flag}")
+    return violations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.queries", description="per-request SQL query budgets")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--departments", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="print the statements of endpoints over budget")
+    args = parser.parse_args(argv)
+
+    violations = asyncio.run(run(args))
+    if violations:
+        print(f"\n{len(violations)} endpoint(s) over their query budget")
+        if args.verbose:
+            for line in violations:
+                print(f"\n{line}")
+        return 1
+    print("\nAll endpoints within their query budgets.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# benchmarks/serialization.py
+"""
+1k 行列表响应的序列化前后对比。
+
+"before" 复现拆分路由之前的写法：遍历模型实例、按需访问外键（每行一次额外查询），
+再经 jsonable_encoder + JSONResponse 输出；"after" 是 routers/admin.py 中现在的写法：
+一次 JOIN 查询的 .tuples() / .dicts() 结果直接交给 ORJSONResponse。
+
+    python -m benchmarks.serialization --rows 1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import profiling
+from benchmarks.harness import SeedConfig, seed_database
+from db import db
+from models import User, Department
+from responses import ORJSONResponse
+from routers.admin import user_rows, department_rows
+
+
+def legacy_users(rows: int) -> JSONResponse:
+    users = User.select().order_by(User.id).paginate(1, rows)
+    return JSONResponse(jsonable_encoder([
+        {
+            "id": user.id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "email": user.email,
+            "created_at": user.created_at.isoformat(),
+            "department": {
+                "id": user.department.id,
+                "name": user.department.name,
+            } if user.department else None
+        }
+        for user in users
+    ]))
+
+
+def legacy_departments(rows: int) -> JSONResponse:
+    return JSONResponse(jsonable_encoder([{
+        "id": dept.id,
+        "name": dept.name,
+        "description": dept.description,
+        "parent_id": dept.parent.id if dept.parent else None
+    } for dept in Department.select()]))
+
+
+def current_users(rows: int) -> ORJSONResponse:
+    return ORJSONResponse(user_rows(1, rows))
+
+
+def current_departments(rows: int) -> ORJSONResponse:
+    return ORJSONResponse(department_rows())
+
+
+def measure(fn, rows: int, repeat: int) -> dict:
+    fn(rows)  # 预热
+    timings = []
+    with profiling.profile() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = fn(rows)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(timings),
+        "queries": counter.count / repeat,
+        "bytes": len(response.body),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="sso-bench-"), "bench.db")
+    seed_database(path, SeedConfig(users=args.rows, departments=args.rows, clients=1))
+    db.connect(reuse_if_open=True)
+
+    print(f"{'list':<14}{'variant':<9}{'median ms':>11}{'queries':>9}{'bytes':>10}")
+    for name, before, after in [
+        ("users", legacy_users, current_users),
+        ("departments", legacy_departments, current_departments),
+    ]:
+        results = {"before": measure(before, args.rows, args.repeat), "after": measure(after, args.rows, args.repeat)}
+        for variant, r in results.items():
+            print(f"{name:<14}{variant:<9}{r['median_ms']:>11.2f}{r['queries']:>9.0f}{r['bytes']:>10}")
+        speedup = results["before"]["median_ms"] / results["after"]["median_ms"]
+        print(f"{'':<14}{'speedup':<9}{speedup:>10.1f}x")
+
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
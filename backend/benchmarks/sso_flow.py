@@ -0,0 +1,245 @@
+# benchmarks/sso_flow.py
+"""
+SSO 全流程与管理端接口的基准场景。
+
+所有请求都通过 httpx.ASGITransport 在进程内驱动 FastAPI 应用，不经过网络。
+Cookie 通过显式的请求头传递，保证并发迭代之间互不干扰。
+"""
+import io
+import random
+from dataclasses import dataclass, field
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+
+from benchmarks.harness import Scenario, SEED_PASSWORD, ADMIN_USERNAME, ADMIN_PASSWORD
+from tokens import SSO_SESSION_COOKIE, ADMIN_SESSION_COOKIE
+
+
+@dataclass
+class BenchContext:
+    http: httpx.AsyncClient
+    seed: dict
+    rnd: random.Random
+    import_rows: int = 5
+    admin_token: str = ""
+    # 预先登录好的一批 SSO 会话，供 authorize / token / me 场景复用
+    sso_tokens: list[str] = field(default_factory=list)
+
+    def random_client(self) -> dict:
+        return self.rnd.choice(self.seed["clients"])
+
+    def random_username(self) -> str:
+        return self.rnd.choice(self.seed["usernames"])
+
+
+def _expect(response: httpx.Response, *status_codes: int) -> httpx.Response:
+    if response.status_code not in status_codes:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} -> "
+                           f"{response.status_code}: {response.text[:200]}")
+    return response
+
+
+async def sso_login(ctx: BenchContext, username: str) -> str:
+    response = _expect(await ctx.http.post(
+        "/api/login", data={"username": username, "password": SEED_PASSWORD}), 200)
+    return response.cookies[SSO_SESSION_COOKIE]
+
+
+async def authorize(ctx: BenchContext, sso_token: str, client: dict) -> str:
+    response = _expect(await ctx.http.get(
+        "/authorize",
+        params={"client_id": client["client_id"], "redirect_uri": client["redirect_uri"], "response_type": "code"},
+        headers={"Cookie": f"{SSO_SESSION_COOKIE}={sso_token}"},
+    ), 302, 307)
+    location = response.headers["location"]
+    code = parse_qs(urlparse(location).query).get("code")
+    if not code:
+        raise RuntimeError(f"/authorize did not issue a code: {location}")
+    return code[0]
+
+
+async def exchange_code(ctx: BenchContext, code: str, client: dict) -> str:
+    response = _expect(await ctx.http.post("/token", data={
+        "code": code,
+        "client_id": client["client_id"],
+        "client_secret": client["client_secret"],
+        "grant_type": "authorization_code",
+    }), 200)
+    return response.json()["access_token"]
+
+
+async def get_me(ctx: BenchContext, token: str):
+    _expect(await ctx.http.get("/api/me", headers={"Cookie": f"{SSO_SESSION_COOKIE}={token}"}), 200)
+
+
+def _admin_headers(ctx: BenchContext) -> dict:
+    return {"Cookie": f"{ADMIN_SESSION_COOKIE}={ctx.admin_token}"}
+
+
+async def setup_context(ctx: BenchContext, session_pool: int = 20):
+    """登录管理员和一小批 SSO 用户；bcrypt 很慢，所以只在准备阶段做一次。"""
+    response = _expect(await ctx.http.post(
+        "/api/admin/login", data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}), 200)
+    ctx.admin_token = response.cookies[ADMIN_SESSION_COOKIE]
+    for _ in range(session_pool):
+        ctx.sso_tokens.append(await sso_login(ctx, ctx.random_username()))
+
+
+def _xlsx_bytes(columns: list[str], rows: list[list]) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+# --- 场景定义 ---
+
+
+async def _run_login(ctx, username):
+    await sso_login(ctx, username)
+
+
+async def _prepare_authorize(ctx, i):
+    return ctx.rnd.choice(ctx.sso_tokens), ctx.random_client()
+
+
+async def _run_authorize(ctx, state):
+    await authorize(ctx, *state)
+
+
+async def _prepare_token(ctx, i):
+    client = ctx.random_client()
+    return await authorize(ctx, ctx.rnd.choice(ctx.sso_tokens), client), client
+
+
+async def _run_token(ctx, state):
+    await exchange_code(ctx, *state)
+
+
+async def _run_me(ctx, token):
+    await get_me(ctx, token)
+
+
+async def _prepare_me_not_modified(ctx, i):
+    token = ctx.rnd.choice(ctx.sso_tokens)
+    response = _expect(await ctx.http.get("/api/me", headers={"Cookie": f"{SSO_SESSION_COOKIE}={token}"}), 200)
+    return token, response.headers["etag"]
+
+
+async def _run_me_not_modified(ctx, state):
+    token, etag = state
+    _expect(await ctx.http.get("/api/me", headers={"Cookie": f"{SSO_SESSION_COOKIE}={token}",
+                                                   "If-None-Match": etag}), 304)
+
+
+async def _run_full_flow(ctx, state):
+    username, client = state
+    sso_token = await sso_login(ctx, username)
+    code = await authorize(ctx, sso_token, client)
+    await exchange_code(ctx, code, client)
+    # 浏览器端持有的是登录时下发的 SSO 会话 Cookie，/api/me 以它为凭证
+    await get_me(ctx, sso_token)
+
+
+async def _prepare_directory_lookup(ctx, i):
+    return ctx.random_client(), [ctx.random_username() for _ in range(50)]
+
+
+async def _run_directory_lookup(ctx, state):
+    client, usernames = state
+    _expect(await ctx.http.get("/api/directory/users", params={"username": usernames},
+                               auth=(client["client_id"], client["client_secret"])), 200)
+
+
+async def _prepare_users_page(ctx, i):
+    pages = max(1, len(ctx.seed["usernames"]) // 100)
+    return ctx.rnd.randint(1, pages)
+
+
+async def _run_users_page(ctx, page):
+    _expect(await ctx.http.get("/api/admin/users", params={"page": page, "page_size": 100},
+                               headers=_admin_headers(ctx)), 200)
+
+
+def _admin_get(path):
+    async def run(ctx, state):
+        _expect(await ctx.http.get(path, headers=_admin_headers(ctx)), 200)
+    return run
+
+
+async def _prepare_import_users(ctx, i):
+    departments = ctx.seed["department_names"]
+    rows = [
+        [f"import{i:04d}_{j:03d}", f"import{i:04d}_{j:03d}@example.com", f"Imported {i}-{j}",
+         "Password123", ctx.rnd.choice(departments) if departments else ""]
+        for j in range(ctx.import_rows)
+    ]
+    return _xlsx_bytes(["username", "email", "full_name", "password", "department_name"], rows)
+
+
+async def _run_import_users(ctx, payload):
+    files = {"file": ("users.xlsx", payload,
+                      "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    _expect(await ctx.http.post("/api/admin/users/import", files=files, headers=_admin_headers(ctx)), 200)
+
+
+async def _run_sync_users(ctx, payload):
+    files = {"file": ("users.xlsx", payload,
+                      "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    _expect(await ctx.http.post("/api/admin/users/import", params={"incremental": "true"},
+                                files=files, headers=_admin_headers(ctx)), 200)
+
+
+async def _prepare_import_departments(ctx, i):
+    count = len(ctx.seed["department_names"])
+    rows = [[n + 1, f"Imported Department {n:04d}", (n + 1) // 2 if n else "", ""] for n in range(count)]
+    return _xlsx_bytes(["id", "name", "parent_id", "description"], rows)
+
+
+async def _run_import_departments(ctx, payload):
+    files = {"file": ("departments.xlsx", payload,
+                      "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    _expect(await ctx.http.post("/api/admin/departments/import", files=files, headers=_admin_headers(ctx)), 200)
+
+
+async def _prepare_login(ctx, i):
+    return ctx.random_username()
+
+
+async def _prepare_me(ctx, i):
+    return ctx.rnd.choice(ctx.sso_tokens)
+
+
+async def _prepare_full_flow(ctx, i):
+    return ctx.random_username(), ctx.random_client()
+
+
+def build_scenarios() -> list[Scenario]:
+    """按执行顺序返回场景；会改写部门表的导入场景放在最后。"""
+    return [
+        Scenario("login", _run_login, _prepare_login, scale=0.1),
+        Scenario("authorize", _run_authorize, _prepare_authorize),
+        Scenario("token", _run_token, _prepare_token),
+        Scenario("me", _run_me, _prepare_me),
+        Scenario("me_not_modified", _run_me_not_modified, _prepare_me_not_modified),
+        Scenario("sso_flow", _run_full_flow, _prepare_full_flow, scale=0.1),
+        Scenario("directory_lookup_50", _run_directory_lookup, _prepare_directory_lookup),
+        Scenario("admin_users_page", _run_users_page, _prepare_users_page),
+        Scenario("admin_departments_list", _admin_get("/api/admin/departments")),
+        Scenario("admin_clients_list", _admin_get("/api/admin/clients")),
+        Scenario("admin_user_stats", _admin_get("/api/admin/stats/users")),
+        Scenario("admin_stats_timeseries", _admin_get("/api/admin/stats/timeseries?days=30")),
+        Scenario("admin_export_users_csv", _admin_get("/api/admin/users/export?format=csv"), scale=0.1),
+        Scenario("admin_export_users_xlsx", _admin_get("/api/admin/users/export?format=xlsx"), scale=0.05),
+        Scenario("admin_import_users", _run_import_users, _prepare_import_users, scale=0.02),
+        # 与上一个场景生成相同的用户名，模拟大部分行已存在的日常增量同步
+        Scenario("admin_sync_users", _run_sync_users, _prepare_import_users, scale=0.02),
+        Scenario("admin_import_departments", _run_import_departments, _prepare_import_departments, scale=0.05),
+    ]
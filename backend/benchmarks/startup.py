@@ -0,0 +1,103 @@
+# benchmarks/startup.py
+"""
+冷启动预算检查。
+
+在全新的解释器中多次导入 main，取导入耗时的中位数与预算比较，超出预算时退出码为 1；
+同时确认只在请求时才需要的重量级依赖没有在导入阶段被加载。
+
+    python -m benchmarks.startup                  # 默认预算
+    python -m benchmarks.startup --budget-ms 800 --profile
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块必须延迟到第一次使用时才导入
+# （email_validator 不在其中：安装了它时 FastAPI 自身会在导入阶段加载）
+DEFERRED_MODULES = ["jose", "passlib", "openpyxl", "pandas"]
+
+DEFAULT_BUDGET_MS = float(os.environ.get("SSO_STARTUP_BUDGET_MS", 1000))
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - start) * 1000
+loaded = [m for m in {deferred!r} if m in sys.modules]
+print(f"{{elapsed:.3f}}|{{','.join(loaded)}}")
+"""
+
+
+def measure_once() -> tuple[float, list[str]]:
+    """在子进程中导入一次 main，返回 (耗时毫秒, 已被提前加载的延迟模块)。"""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(deferred=DEFERRED_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    elapsed, loaded = result.stdout.strip().splitlines()[-1].split("|")
+    return float(elapsed), [m for m in loaded.split(",") if m]
+
+
+def import_profile(top: int) -> list[tuple[int, str]]:
+    """用 -X importtime 统计 main 直接导入的各个包的累计耗时（微秒），按耗时降序。"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    lines = [line[len("import time:"):].split("|") for line in result.stderr.splitlines()
+             if line.startswith("import time:") and "cumulative" not in line]
+    # -X importtime 按后序输出：main 的直接子导入（一个分隔空格加两格缩进）都出现在 " main" 这一行之前，
+    # 再往前遇到的顶层条目属于解释器自身的启动过程
+    main_index = next(i for i, (_, _, name) in enumerate(lines) if name == " main")
+    entries = []
+    for _, cumulative, name in reversed(lines[:main_index]):
+        indent = len(name) - len(name.lstrip())
+        if indent <= 1:
+            break
+        if indent == 3:
+            entries.append((int(cumulative), name.strip()))
+    entries.sort(reverse=True)
+    return entries[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="cold import time budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="maximum median import time of main (default: SSO_STARTUP_BUDGET_MS or 1000)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--profile", action="store_true", help="print the slowest top-level imports")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    timings = []
+    eager = set()
+    for _ in range(args.runs):
+        elapsed, loaded = measure_once()
+        timings.append(elapsed)
+        eager.update(loaded)
+
+    median = statistics.median(timings)
+    print(f"import main: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    if args.profile:
+        print("\nslowest top-level imports (cumulative):")
+        for cumulative_us, name in import_profile(args.top):
+            print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"\nFAIL: modules that should be deferred were imported at startup: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFAIL: cold import time {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# client_registry.py
+"""
+客户端应用注册表的进程内快照。
+
+每个客户端可以有多个允许的回调地址（Client.redirect_uri 加上 ClientRedirectURI 中的额外地址）
+和多个允许跨域访问的前端来源（ClientOrigin）。客户端表很小，这里一次读出全部内容，
+整理成按 client_id 索引的字典和集合：/authorize 校验回调地址、CORS 判断来源时
+都只做字典和集合查找，不访问数据库。客户端密钥不在快照中：/token 和客户端 Basic 认证
+总是查询数据库，重置密钥或删除客户端后在所有 worker 上立即生效。
+
+本进程内的管理端修改后立即调用 reload()；其他 worker 的修改由 run_refresher 后台任务
+最多在 CLIENT_REGISTRY_REFRESH_SECONDS 秒后加载。
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from peewee import Value
+from starlette.middleware.cors import CORSMiddleware
+
+from db import db
+from models import Client, ClientRedirectURI, ClientOrigin
+
+CLIENT_REGISTRY_REFRESH_SECONDS = float(os.environ.get("CLIENT_REGISTRY_REFRESH_SECONDS", "30"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@dataclass(frozen=True)
+class RegisteredClient:
+    client_id: str
+    redirect_uri: str
+    redirect_uris: frozenset[str]
+    origins: frozenset[str]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    clients: dict[str, RegisteredClient]
+    origins: frozenset[str]
+
+
+# 整体替换快照，读取方无需加锁
+_snapshot = _Snapshot(clients={}, origins=frozenset())
+
+
+def normalize_origin(value: str) -> str | None:
+    """把来源规范为小写的 scheme://host[:port]；带路径、查询等部分或不是 http(s) 时返回 None。"""
+    try:
+        parts = urlsplit(value.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname or parts.path not in ("", "/") \
+            or parts.query or parts.fragment or parts.username or parts.password:
+        return None
+    default_port = {"http": 80, "https": 443}[parts.scheme]
+    host = parts.hostname if port in (None, default_port) else f"{parts.hostname}:{port}"
+    return f"{parts.scheme}://{host}"
+
+
+def load() -> _Snapshot:
+    """
+    用一条 UNION ALL 查询读取全部客户端、回调地址和来源，每个客户端、地址或来源各占一行
+    （不做连接，行数不会随地址数 × 来源数增长）。使用当前线程已有的连接，在请求中调用时不会关闭请求的连接。
+    """
+    query = (Client.select(Client.client_id, Value("client").alias("kind"), Client.redirect_uri.alias("value"))
+             + ClientRedirectURI.select(ClientRedirectURI.client, Value("redirect_uri"), ClientRedirectURI.uri)
+             + ClientOrigin.select(ClientOrigin.client, Value("origin"), ClientOrigin.origin))
+    default_uris: dict[str, str] = {}
+    uris: dict[str, set[str]] = {}
+    origins: dict[str, set[str]] = {}
+    for client_id, kind, value in query.tuples():
+        if kind == "client":
+            default_uris[client_id] = value
+            uris.setdefault(client_id, set()).add(value)
+        elif kind == "redirect_uri":
+            uris.setdefault(client_id, set()).add(value)
+        else:
+            origins.setdefault(client_id, set()).add(value)
+    clients = {
+        client_id: RegisteredClient(
+            client_id=client_id,
+            redirect_uri=redirect_uri,
+            redirect_uris=frozenset(uris[client_id]),
+            origins=frozenset(origins.get(client_id, ())),
+        )
+        for client_id, redirect_uri in default_uris.items()
+    }
+    return _Snapshot(clients=clients, origins=frozenset().union(*(c.origins for c in clients.values())))
+
+
+def reload():
+    """在请求中（管理端修改之后）调用，复用请求的数据库连接。"""
+    global _snapshot
+    _snapshot = load()
+
+
+def refresh():
+    """在请求之外（启动、后台任务）调用，使用独立的连接并在完成后关闭。"""
+    with db.connection_context():
+        reload()
+
+
+async def run_refresher(interval: float = CLIENT_REGISTRY_REFRESH_SECONDS):
+    """lifespan 中启动的后台任务：定期重新加载，使其他 worker 的修改在本进程生效。"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(refresh)
+        except Exception:
+            logger.exception("Failed to reload client registry")
+
+
+def get(client_id: str) -> RegisteredClient | None:
+    return _snapshot.clients.get(client_id)
+
+
+def is_allowed_redirect(client_id: str, redirect_uri: str) -> bool:
+    """回调地址必须与登记的某个地址完全一致。"""
+    client = _snapshot.clients.get(client_id)
+    return client is not None and redirect_uri in client.redirect_uris
+
+
+def is_allowed_origin(origin: str) -> bool:
+    return origin in _snapshot.origins
+
+
+class ClientCORSMiddleware(CORSMiddleware):
+    """在 allow_origins（CORS_ORIGINS 配置）之外，也允许注册表中任一客户端登记的来源。"""
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        return super().is_allowed_origin(origin) or is_allowed_origin(origin)
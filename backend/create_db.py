@@ -1,19 +1,21 @@
 # create_db.py
-from db import db
+from db import db, init_db
 # 导入所有模型
-from models import User, Client, AuthCode, AdminUser, Department,Setting 
+from models import User, Client, ClientRedirectURI, ClientOrigin, AuthCode, AdminUser, Department, Setting, StatCounter, AuditEvent
+import stats
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_tables_and_seed_data():
     print("Connecting to the database...")
+    init_db()
     db.connect()
     
     print("Dropping old tables (if they exist)...")
     # 确保所有模型都包括在内
-    db.drop_tables([User, AdminUser, Client, AuthCode, Department, Setting], safe=True)
-    db.create_tables([User, AdminUser, Client, AuthCode, Department, Setting])
+    db.drop_tables([User, AdminUser, Client, ClientRedirectURI, ClientOrigin, AuthCode, Department, Setting, StatCounter, AuditEvent], safe=True)
+    db.create_tables([User, AdminUser, Client, ClientRedirectURI, ClientOrigin, AuthCode, Department, Setting, StatCounter, AuditEvent])
 
     
     print("Seeding initial data...")
@@ -42,6 +44,7 @@ def create_tables_and_seed_data():
         department=frontend_team # 分配到销售部
     )
     print("SSO User 'john.doe' created.")
+    stats.rebuild_user_counters()
     
     # 2. 创建管理员用户
     AdminUser.create(
@@ -58,6 +61,7 @@ def create_tables_and_seed_data():
         client_secret="client_app_1_secret",
         redirect_uri="http://localhost:3001/api/auth/callback"
     )
+    ClientOrigin.create(client="client_app_1", origin="http://localhost:3001")
     print("Client 'client_app_1' created.")
 
     print("Closing database connection.")
@@ -1,7 +1,38 @@
 # db.py
+import os
+import time
 from peewee import SqliteDatabase
 from contextvars import ContextVar
 
-# 数据库文件名为 sso.db，它将被创建在 backend 目录下
-db_path = "sso.db"
-db = SqliteDatabase(db_path)
\ No newline at end of file
+import profiling
+
+# 数据库文件名默认为 sso.db，它将被创建在 backend 目录下；可以通过 SSO_DB_PATH 覆盖
+db_path = os.environ.get("SSO_DB_PATH", "sso.db")
+
+# WAL 模式允许多个 worker 进程在写入的同时并发读取
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -16 * 1024,  # 16MB 页缓存
+}
+
+
+
+class ProfiledSqliteDatabase(SqliteDatabase):
+    """每条语句执行后把耗时交给 profiling，用于按请求统计语句数和记录慢查询。"""
+
+    def execute_sql(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params)
+        finally:
+            profiling.record(sql, time.perf_counter() - start)
+
+
+db = ProfiledSqliteDatabase(None)
+
+
+def init_db(path: str | None = None):
+    """初始化数据库连接参数。在应用 lifespan、建库脚本和基准测试中调用。"""
+    db.init(path or os.environ.get("SSO_DB_PATH", db_path), pragmas=SQLITE_PRAGMAS, timeout=10)
+    return db
@@ -0,0 +1,20 @@
+# migrations.py
+"""
+启动时对已有数据库做的增量升级。
+
+create_db.py 会重建全部表；已经在运行的部署没有单独的迁移工具，这里只做可以安全重复执行的补建：
+缺失的表、索引和列。多个 worker 同时启动时在 IMMEDIATE 事务中依次执行。
+"""
+from playhouse.migrate import SqliteMigrator, migrate
+
+from db import db
+from models import User, StatCounter, AuditEvent, ClientRedirectURI, ClientOrigin
+
+
+def upgrade():
+    with db.connection_context(), db.atomic(lock_type="IMMEDIATE"):
+        db.create_tables([StatCounter, AuditEvent, ClientRedirectURI, ClientOrigin], safe=True)
+        columns = {column.name for column in db.get_columns(User._meta.table_name)}
+        if "version" not in columns:
+            migrate(SqliteMigrator(db).add_column(User._meta.table_name, "version", User.version))
+        User._schema.create_indexes(safe=True)
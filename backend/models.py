@@ -1,7 +1,8 @@
 # models.py
 import datetime
-from peewee import Model, CharField, ForeignKeyField, DateTimeField, BooleanField,AutoField,TextField, IntegerField
+from peewee import Model, CharField, ForeignKeyField, DateTimeField, BooleanField,AutoField,TextField, IntegerField, CompositeKey, fn
 from db import db
+import user_versions
 
 class BaseModel(Model):
     class Meta:
@@ -22,15 +23,61 @@ class User(BaseModel):
     full_name = CharField()
     email = CharField(unique=True)
     hashed_password = CharField()
-    created_at = DateTimeField(default=datetime.datetime.now)
+    created_at = DateTimeField(default=datetime.datetime.now, index=True)
     
     department = ForeignKeyField(Department, backref='users', null=True, on_delete='SET NULL')
 
+    # 资料每次变更都加 1，用作 /api/me 和 /userinfo 的 ETag
+    version = IntegerField(default=1)
+
+    def save(self, *args, **kwargs):
+        # 更新已有用户时自动递增版本号并失效本进程的版本缓存；
+        # 整批 UPDATE / upsert 需要自行写入 version = version + 1 并调用 user_versions.invalidate()
+        if self.id is not None and self._dirty - {"version"}:
+            self.version += 1
+            if "username" in self._dirty:
+                user_versions.invalidate()
+            else:
+                user_versions.invalidate(self.username)
+        return super().save(*args, **kwargs)
+
+    def delete_instance(self, *args, **kwargs):
+        user_versions.invalidate(self.username)
+        return super().delete_instance(*args, **kwargs)
+
+
+# SCIM 的 userName / emails 过滤按大小写不敏感比较 LOWER(列)，需要表达式索引才能避免全表扫描
+User.add_index(fn.LOWER(User.username), name="user_username_lower")
+User.add_index(fn.LOWER(User.email), name="user_email_lower")
+
 
 class Client(BaseModel):
     client_id = CharField(primary_key=True, max_length=100)
     client_secret = CharField()
-    redirect_uri = CharField()
+    redirect_uri = CharField()  # 默认回调地址，也是允许的回调地址之一
+
+
+class ClientRedirectURI(BaseModel):
+    """客户端额外允许的回调地址（例如测试环境、其他主机名）。"""
+    client = ForeignKeyField(Client, backref='redirect_uris')
+    uri = CharField()
+
+    class Meta:
+        indexes = (
+            (("client", "uri"), True),
+        )
+
+
+class ClientOrigin(BaseModel):
+    """允许跨域访问 SSO 接口的客户端前端来源（scheme://host[:port]）。"""
+    client = ForeignKeyField(Client, backref='origins')
+    origin = CharField()
+
+    class Meta:
+        indexes = (
+            (("client", "origin"), True),
+        )
+
 
 class AuthCode(BaseModel):
     code = CharField(primary_key=True, max_length=100)
@@ -50,4 +97,42 @@ class AdminUser(BaseModel):
 class Setting(BaseModel):
     # key 将是 'session_duration_admin', 'password_min_length' 等
     key = CharField(primary_key=True)
-    value = TextField()
\ No newline at end of file
+    value = TextField()
+
+
+class StatCounter(BaseModel):
+    """
+    预先汇总的统计计数器，由 stats 模块维护。
+    metric 为指标名；key 为维度（部门 id、客户端 id 等，无维度时为空串）；
+    day 为 YYYY-MM-DD，累计值（如总用户数）的 day 为空串。
+    """
+    metric = CharField(max_length=50)
+    key = CharField(max_length=100, default="")
+    day = CharField(max_length=10, default="")
+    value = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey("metric", "key", "day")
+        indexes = (
+            # 时间序列查询按 metric + 日期范围读取
+            (("metric", "day"), False),
+        )
+
+
+class AuditEvent(BaseModel):
+    """只追加的登录/授权审计日志，由 audit 模块批量写入。"""
+    id = AutoField()
+    created_at = DateTimeField(index=True)
+    event = CharField(max_length=30)
+    success = BooleanField(default=True)
+    username = CharField(null=True)
+    client_id = CharField(max_length=100, null=True)
+    ip_address = CharField(max_length=45, null=True)
+    detail = TextField(null=True)
+
+    class Meta:
+        indexes = (
+            (("username", "created_at"), False),
+            (("client_id", "created_at"), False),
+            (("event", "created_at"), False),
+        )
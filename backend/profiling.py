@@ -0,0 +1,126 @@
+# profiling.py
+"""
+SQL 语句计数与慢查询分析。
+
+同步的 peewee 数据库（db.py）和异步连接池（async_db.py）执行每条语句后都会调用 record()。
+统计结果记在当前上下文（contextvar）的 QueryProfile 上，线程池中执行的同步处理函数也能继承它：
+- QueryProfilingMiddleware 为每个请求建立一个 QueryProfile；设置 SSO_PROFILE_QUERIES=1 时，
+  响应头 X-DB-Queries 和 Server-Timing 报告该请求的语句数和数据库耗时；
+- 超过 SSO_SLOW_QUERY_MS 的语句连同调用位置写入日志；
+- 测试和基准中用 assert_max_queries(n) 限定一段代码最多执行的语句数，N+1 回归会直接失败。
+"""
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+PROFILE_HEADERS = os.environ.get("SSO_PROFILE_QUERIES", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.environ.get("SSO_SLOW_QUERY_MS", "100"))
+MAX_RECORDED_STATEMENTS = 200
+
+logger = logging.getLogger("uvicorn.error")
+
+# 查找调用位置时跳过的模块和包
+_INTERNAL_FILES = {"peewee.py", "profiling.py", "db.py", "async_db.py"}
+_INTERNAL_PACKAGES = (f"{os.sep}playhouse{os.sep}", f"{os.sep}aiosqlite{os.sep}")
+
+
+@dataclass
+class QueryProfile:
+    count: int = 0
+    total_ms: float = 0.0
+    slow: list[tuple[float, str, str]] = field(default_factory=list)
+    # 只有 capture=True 时才记录每条语句，供 assert_max_queries 报告
+    statements: list[str] | None = None
+    parent: "QueryProfile | None" = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, sql: str, elapsed_ms: float, call_site: str | None):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if call_site is not None:
+                self.slow.append((elapsed_ms, sql, call_site))
+            if self.statements is not None and len(self.statements) < MAX_RECORDED_STATEMENTS:
+                self.statements.append(sql)
+
+
+_current: ContextVar[QueryProfile | None] = ContextVar("query_profile", default=None)
+
+
+def call_site() -> str:
+    """返回执行语句的业务代码位置（跳过 peewee、aiosqlite 和本模块的栈帧）。"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        internal = os.path.basename(filename) in _INTERNAL_FILES or any(p in filename for p in _INTERNAL_PACKAGES)
+        if not internal:
+            return f"{os.path.relpath(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+def record(sql: str, elapsed: float):
+    """由数据库层在每条语句执行后调用，elapsed 以秒为单位。"""
+    elapsed_ms = elapsed * 1000
+    site = None
+    if elapsed_ms >= SLOW_QUERY_MS:
+        site = call_site()
+        logger.warning("Slow query (%.1f ms) at %s: %s", elapsed_ms, site, sql)
+    profile = _current.get()
+    while profile is not None:
+        profile.add(sql, elapsed_ms, site)
+        profile = profile.parent
+
+
+@contextmanager
+def profile(capture: bool = False):
+    """在上下文期间统计语句；嵌套时外层的统计也包含内层。"""
+    current = QueryProfile(statements=[] if capture else None, parent=_current.get())
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(n: int):
+    """
+    断言上下文内最多执行 n 条 SQL 语句，超出时抛出 AssertionError 并列出执行过的语句。
+
+        with assert_max_queries(3):
+            client.get("/api/admin/users")
+    """
+    with profile(capture=True) as current:
+        yield current
+    if current.count > n:
+        statements = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(current.statements, 1))
+        raise AssertionError(f"Expected at most {n} queries, {current.count} were executed:\n{statements}")
+
+
+class QueryProfilingMiddleware:
+    """纯 ASGI 中间件：为每个请求建立 QueryProfile，按需在响应头中报告。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with profile() as current:
+            async def send_with_profile(message):
+                if message["type"] == "http.response.start" and PROFILE_HEADERS:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-queries", f"{current.count}".encode()),
+                        (b"server-timing", f'db;dur={current.total_ms:.2f};desc="{current.count} queries"'.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
+
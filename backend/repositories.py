@@ -0,0 +1,65 @@
+# repositories.py
+"""
+OAuth / 登录热路径使用的异步查询。每个函数对应一条 SQL 语句，返回元组而不是模型实例。
+"""
+from datetime import datetime
+
+from peewee import JOIN
+
+from async_db import adb
+from models import User, Client, AuthCode, Department
+
+
+async def get_client_secret(client_id: str) -> str | None:
+    """客户端凭据总是从数据库读取：重置密钥或删除客户端后在所有 worker 上立即生效。"""
+    row = await adb.fetchone(Client.select(Client.client_secret).where(Client.client_id == client_id))
+    return row[0] if row else None
+
+
+async def get_login_user(username: str) -> tuple[int, str, str, str] | None:
+    """返回 (id, username, email, hashed_password)。"""
+    return await adb.fetchone(User
+                              .select(User.id, User.username, User.email, User.hashed_password)
+                              .where(User.username == username))
+
+
+async def get_user_id(username: str) -> int | None:
+    row = await adb.fetchone(User.select(User.id).where(User.username == username))
+    return row[0] if row else None
+
+
+async def get_user_version(username: str) -> tuple[int, int] | None:
+    """返回 (id, version)。"""
+    return await adb.fetchone(User.select(User.id, User.version).where(User.username == username))
+
+
+def _profile_query():
+    return (User
+            .select(User.id, User.version, User.username, User.full_name, User.email, Department.name)
+            .join(Department, JOIN.LEFT_OUTER))
+
+
+async def get_profile(username: str) -> tuple | None:
+    """返回 (id, version, username, full_name, email, department_name)。"""
+    return await adb.fetchone(_profile_query().where(User.username == username))
+
+
+async def get_profile_by_id(user_id: int) -> tuple | None:
+    return await adb.fetchone(_profile_query().where(User.id == user_id))
+
+
+async def create_auth_code(code: str, user_id: int, client_id: str, exp: datetime):
+    await adb.execute(AuthCode.insert(code=code, user=user_id, client=client_id, exp=exp, is_used=False))
+
+
+async def consume_auth_code(code: str, client_id: str, now: datetime) -> int | None:
+    """
+    用一条 UPDATE ... RETURNING 把有效的授权码标记为已使用并返回其用户 id。
+    授权码不存在、属于其他客户端、已使用或已过期时返回 None；并发的重复兑换只有一个能成功。
+    """
+    row = await adb.fetchone(AuthCode
+                             .update(is_used=True)
+                             .where((AuthCode.code == code) & (AuthCode.client == client_id)
+                                    & (AuthCode.is_used == False) & (AuthCode.exp >= now))  # noqa: E712
+                             .returning(AuthCode.user))
+    return row[0] if row else None
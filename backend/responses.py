@@ -0,0 +1,47 @@
+# responses.py
+import hashlib
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    用 orjson 序列化的 JSON 响应。
+
+    列表接口直接把 `.dicts()` / `.tuples()` 查询得到的原生数据交给它，跳过逐行的模型校验和
+    jsonable_encoder；datetime 会被序列化为 ISO 8601 字符串，与 `.isoformat()` 一致。
+    （FastAPI 自带的 ORJSONResponse 已被弃用。）
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def weak_etag(body: bytes) -> str:
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中 etag（弱比较，支持逗号分隔的多个值和 *）。"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+def cached_json_response(request: Request, content, cache_control: str, vary: str | None = None) -> Response:
+    """
+    返回带 ETag 和 Cache-Control 的 JSON 响应；请求携带的 If-None-Match 与内容一致时返回 304，
+    调用方可以继续使用自己缓存的副本。
+    """
+    response = ORJSONResponse(content)
+    headers = {"ETag": weak_etag(response.body), "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1 @@
+# routers/__init__.py
@@ -0,0 +1,519 @@
+# routers/admin.py
+"""管理后台接口：管理员会话、用户、客户端平台、部门和安全设置。"""
+import secrets
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, Form, Query
+from peewee import JOIN
+
+import audit
+import client_registry
+import sessions
+import settings
+import stats
+import user_versions
+from db import db
+from client_registry import RegisteredClient
+from models import Setting, User, Client, ClientRedirectURI, ClientOrigin, AdminUser, Department
+from responses import ORJSONResponse
+from schemas import (
+    UserCreate, PasswordReset, UserUpdate, ClientCreate, ClientUpdate,
+    DepartmentCreate, DepartmentUpdate, ChangePasswordRequest, SecuritySettings,
+    MessageResponse, AdminProfile, UserStats, StatsTimeSeries, AuditPage, UserPage, UserCreated,
+    ClientOut, ClientCreated, ClientSecret, DepartmentOut,
+)
+from security import (
+    hash_password, verify_password, get_current_admin_user,
+)
+
+router = APIRouter()
+
+
+# --- 列表查询 ---
+# 列表接口直接从 .tuples() / .dicts() 查询构造原生数据并用 orjson 序列化，
+# 不为每一行创建模型实例，也不经过 jsonable_encoder；response_model 仅用于生成文档。
+
+
+def client_out(client: RegisteredClient) -> dict:
+    # 注意：我们不在列表视图中返回 client_secret
+    return {
+        "client_id": client.client_id,
+        "redirect_uri": client.redirect_uri,
+        "redirect_uris": [client.redirect_uri, *sorted(client.redirect_uris - {client.redirect_uri})],
+        "allowed_origins": sorted(client.origins),
+    }
+
+
+def client_rows() -> list[dict]:
+    # 直接读数据库（一条语句）而不是本进程的注册表快照，管理端总能看到其他 worker 刚做的修改
+    return [client_out(client) for client in client_registry.load().clients.values()]
+
+
+def user_rows(page: int, page_size: int) -> list[dict]:
+    """一页用户及其所属部门，用一次 LEFT JOIN 查询取出。"""
+    query = (User
+             .select(User.id, User.username, User.full_name, User.email, User.created_at,
+                     Department.id, Department.name)
+             .join(Department, JOIN.LEFT_OUTER)
+             .order_by(User.id)
+             .paginate(page, page_size)
+             .tuples())
+    return [
+        {
+            "id": user_id,
+            "username": username,
+            "full_name": full_name,
+            "email": email,
+            "created_at": created_at,
+            "department": {"id": dept_id, "name": dept_name} if dept_id is not None else None
+        }
+        for user_id, username, full_name, email, created_at, dept_id, dept_name in query
+    ]
+
+
+def department_rows() -> list[dict]:
+    return list(Department
+                .select(Department.id, Department.name, Department.description,
+                        Department.parent.alias("parent_id"))
+                .dicts())
+
+
+@router.post("/api/admin/login", response_model=MessageResponse)
+def admin_login(request: Request, response: Response, username: str = Form(...), password: str = Form(...)):
+    admin = AdminUser.get_or_none(AdminUser.username == username)
+    if not admin or not verify_password(password, admin.hashed_password):
+        audit.record(audit.ADMIN_LOGIN, success=False, username=username, ip_address=audit.client_ip(request))
+        raise HTTPException(
+            status_code=400, detail="Incorrect admin username or password")
+
+    # 会话时长取自安全设置（session_duration_admin_hours）
+    sessions.issue_admin_session(response, admin.username, admin.email)
+    audit.record(audit.ADMIN_LOGIN, username=admin.username, ip_address=audit.client_ip(request))
+    return {"message": "Admin login successful"}
+
+
+@router.get("/api/admin/me", response_model=AdminProfile)
+def get_admin_profile(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取当前登录的管理员信息。"""
+    return {
+        "sub": current_admin.username,
+        "email": current_admin.email,
+        "full_name": current_admin.full_name,
+        "role": "admin"
+    }
+
+
+@router.get("/api/clients", response_model=list[ClientOut])
+def get_all_clients_for_dashboard(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取所有客户端，现在受 get_current_admin_user 保护。"""
+    return ORJSONResponse(client_rows())
+
+
+@router.get("/api/admin/stats/users", response_model=UserStats)
+def get_user_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取 SSO 用户的统计信息，读取预先汇总的计数器。"""
+    return {
+        "total_users": stats.total_users(),
+        "new_users_last_7_days": stats.new_users(7),
+    }
+
+
+@router.get("/api/admin/stats/timeseries", response_model=StatsTimeSeries)
+def get_stats_timeseries(
+    days: int = Query(30, ge=1, le=366),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """最近 days 天的每日新增用户、各客户端的登录和令牌交换次数，以及各部门人数。"""
+    return ORJSONResponse(stats.timeseries(days))
+
+
+@router.get("/api/admin/audit", response_model=AuditPage)
+def get_audit_events(
+    start: datetime | None = Query(None, description="Inclusive lower bound (UTC)."),
+    end: datetime | None = Query(None, description="Exclusive upper bound (UTC)."),
+    event: str | None = Query(None),
+    username: str | None = Query(None),
+    client_id: str | None = Query(None),
+    success: bool | None = Query(None),
+    cursor: str | None = Query(None, description="next_cursor from the previous page."),
+    limit: int = Query(100, ge=1, le=500),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """按时间倒序查询登录和授权审计事件。最近几秒内的事件可能还在缓冲区中，尚未写入。"""
+    try:
+        items = audit.query(start, end, event, username, client_id, success, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return ORJSONResponse({
+        "items": items,
+        "next_cursor": audit.encode_cursor(items[-1]) if len(items) == limit else None,
+    })
+
+
+@router.get("/api/admin/users", response_model=UserPage)
+def get_all_sso_users(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """获取 SSO 用户列表，支持分页。"""
+    return ORJSONResponse({
+        "items": user_rows(page, page_size),
+        "total": stats.total_users(),
+        "page": page,
+        "page_size": page_size
+    })
+
+
+@router.put("/api/admin/users/{user_id}", response_model=MessageResponse)
+def update_sso_user(
+    user_id: int,
+    user_data: UserUpdate,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """更新一个 SSO 用户的信息。"""
+    user = User.get_or_none(User.id == user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    # 检查邮箱是否与其它用户冲突
+    existing_user_by_email = User.get_or_none(User.email == user_data.email)
+    if existing_user_by_email and existing_user_by_email.id != user_id:
+        raise HTTPException(
+            status_code=409, detail="Email already in use by another user.")
+
+    old_department_id = user.department_id
+    user.full_name = user_data.full_name
+    user.email = user_data.email
+    user.department_id = user_data.department_id
+
+    # 如果提供了新密码，则更新密码
+    if user_data.password:
+        user.hashed_password = hash_password(user_data.password)
+
+    with db.atomic():
+        user.save()
+        stats.users_moved([(old_department_id, user.department_id)])
+
+    return {"message": "User updated successfully."}
+
+
+@router.post("/api/admin/users", response_model=UserCreated)
+def create_sso_user(
+    user_data: UserCreate,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """创建一个新的 SSO 用户。"""
+    # 检查用户名或邮箱是否已存在
+    if User.get_or_none((User.username == user_data.username) | (User.email == user_data.email)):
+        raise HTTPException(
+            status_code=409, detail="Username or email already exists.")
+
+    hashed_password = hash_password(user_data.password)
+    with db.atomic():
+        new_user = User.create(
+            username=user_data.username,
+            full_name=user_data.full_name,
+            email=user_data.email,
+            hashed_password=hashed_password,
+            department_id=user_data.department_id
+        )
+        stats.user_added(new_user.department_id, new_user.created_at)
+    return {"message": "User created successfully", "user_id": new_user.id}
+
+
+@router.delete("/api/admin/users/{user_id}", response_model=MessageResponse)
+def delete_sso_user(
+    user_id: int,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """删除一个 SSO 用户。"""
+    user = User.get_or_none(User.id == user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    with db.atomic():
+        user.delete_instance()
+        stats.user_removed(user.department_id)
+    return {"message": "User deleted successfully"}
+
+
+@router.post("/api/admin/users/{user_id}/reset-password", response_model=MessageResponse)
+def reset_user_password(
+    user_id: int,
+    password_data: PasswordReset,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """重置指定用户的密码。"""
+    user = User.get_or_none(User.id == user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    user.hashed_password = hash_password(password_data.new_password)
+    user.save()
+    return {"message": "Password reset successfully"}
+
+
+
+@router.get("/api/admin/clients", response_model=list[ClientOut])
+def get_all_clients(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取所有已注册的客户端应用。"""
+    return ORJSONResponse(client_rows())
+
+
+def normalized_origins(origins: list[str]) -> set[str]:
+    result = set()
+    for origin in origins:
+        normalized = client_registry.normalize_origin(origin)
+        if normalized is None:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid origin '{origin}', expected scheme://host[:port].")
+        result.add(normalized)
+    return result
+
+
+def save_client_registry(client_id: str, redirect_uri: str, redirect_uris, origins: set[str] | None):
+    """替换客户端的额外回调地址和来源；参数为 None 的部分保持不变。"""
+    if redirect_uris is not None:
+        ClientRedirectURI.delete().where(ClientRedirectURI.client == client_id).execute()
+        extra = {str(uri) for uri in redirect_uris} - {redirect_uri}
+        if extra:
+            ClientRedirectURI.insert_many(
+                [{"client": client_id, "uri": uri} for uri in sorted(extra)]).execute()
+    if origins is not None:
+        ClientOrigin.delete().where(ClientOrigin.client == client_id).execute()
+        if origins:
+            ClientOrigin.insert_many(
+                [{"client": client_id, "origin": origin} for origin in sorted(origins)]).execute()
+
+
+@router.post("/api/admin/clients", response_model=ClientCreated)
+def create_client(
+    client_data: ClientCreate,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """创建一个新的客户端平台。"""
+    if Client.get_or_none(Client.client_id == client_data.client_id):
+        raise HTTPException(
+            status_code=409, detail="Client ID already exists.")
+    origins = normalized_origins(client_data.allowed_origins)
+
+    # 生成一个安全的 client_secret
+    client_secret = secrets.token_hex(32)
+
+    with db.atomic():
+        new_client = Client.create(
+            client_id=client_data.client_id,
+            client_secret=client_secret,
+            redirect_uri=str(client_data.redirect_uri)  # 转换为字符串存储
+        )
+        save_client_registry(new_client.client_id, new_client.redirect_uri, client_data.redirect_uris, origins)
+    client_registry.reload()
+
+    # 在响应中返回新创建的客户端，包括密钥，以便管理员可以复制它
+    return {
+        **client_out(client_registry.get(new_client.client_id)),
+        "client_secret": new_client.client_secret,  # 仅在创建时返回
+    }
+
+
+@router.put("/api/admin/clients/{client_id}", response_model=ClientOut)
+def update_client(
+    client_id: str,
+    client_data: ClientUpdate,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """更新客户端平台信息。"""
+    client = Client.get_or_none(Client.client_id == client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found.")
+    origins = None if client_data.allowed_origins is None else normalized_origins(client_data.allowed_origins)
+
+    with db.atomic():
+        client.redirect_uri = str(client_data.redirect_uri)
+        client.save()
+        save_client_registry(client.client_id, client.redirect_uri, client_data.redirect_uris, origins)
+    client_registry.reload()
+
+    return client_out(client_registry.get(client.client_id))
+
+
+@router.delete("/api/admin/clients/{client_id}", response_model=MessageResponse)
+def delete_client(
+    client_id: str,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """删除一个客户端平台。"""
+    client = Client.get_or_none(Client.client_id == client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found.")
+
+    with db.atomic():
+        ClientRedirectURI.delete().where(ClientRedirectURI.client == client_id).execute()
+        ClientOrigin.delete().where(ClientOrigin.client == client_id).execute()
+        client.delete_instance()
+    client_registry.reload()
+    return {"message": "Client deleted successfully"}
+
+
+def is_descendant(dept_id: int, potential_parent_id: int) -> bool:
+    """检查 potential_parent_id 是否是 dept_id 的子孙。"""
+    if dept_id == potential_parent_id:
+        return True
+    parent = Department.get_or_none(Department.id == potential_parent_id)
+    while parent:
+        if parent.id == dept_id:
+            return True
+        parent = parent.parent
+    return False
+
+
+@router.get("/api/admin/departments", response_model=list[DepartmentOut])
+def get_all_departments(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取所有部门的扁平列表。"""
+    return ORJSONResponse(department_rows())
+
+
+@router.post("/api/admin/departments", response_model=DepartmentOut)
+def create_department(dept_data: DepartmentCreate, current_admin: AdminUser = Depends(get_current_admin_user)):
+    """创建一个新部门。"""
+    if Department.get_or_none(Department.name == dept_data.name):
+        raise HTTPException(
+            status_code=409, detail="Department name already exists.")
+
+    new_dept = Department.create(
+        name=dept_data.name,
+        description=dept_data.description,
+        parent_id=dept_data.parent_id
+    )
+    return {
+        "id": new_dept.id,
+        "name": new_dept.name,
+        "description": new_dept.description,
+        "parent_id": new_dept.parent_id
+    }
+
+
+@router.put("/api/admin/departments/{dept_id}", response_model=DepartmentOut)
+def update_department(dept_id: int, dept_data: DepartmentUpdate, current_admin: AdminUser = Depends(get_current_admin_user)):
+    """更新一个部门。"""
+    dept = Department.get_or_none(Department.id == dept_id)
+    if not dept:
+        raise HTTPException(status_code=404, detail="Department not found.")
+
+    existing_dept = Department.get_or_none(Department.name == dept_data.name)
+    if existing_dept and existing_dept.id != dept_id:
+        raise HTTPException(
+            status_code=409, detail="Department name already in use.")
+
+    if dept_data.parent_id and is_descendant(dept_id=dept_id, potential_parent_id=dept_data.parent_id):
+        raise HTTPException(
+            status_code=400, detail="A department cannot be a child of itself or its descendants.")
+
+    dept.name = dept_data.name
+    dept.description = dept_data.description
+    dept.parent_id = dept_data.parent_id
+    dept.save()
+    return {
+        "id": dept.id,
+        "name": dept.name,
+        "description": dept.description,
+        "parent_id": dept.parent_id
+    }
+
+
+@router.delete("/api/admin/departments/{dept_id}", response_model=MessageResponse)
+def delete_department(dept_id: int, current_admin: AdminUser = Depends(get_current_admin_user)):
+    """删除一个部门。"""
+    dept = Department.get_or_none(Department.id == dept_id)
+    if not dept:
+        raise HTTPException(status_code=404, detail="Department not found.")
+
+    with db.atomic():
+        # SQLite 未开启外键约束，on_delete='SET NULL' 不会生效，手动解除成员的关联
+        User.update(department=None, version=User.version + 1).where(User.department == dept.id).execute()
+        dept.delete_instance()
+        stats.forget_department(dept.id)
+        stats.refresh_departments([None])
+    user_versions.invalidate()
+    return {"message": "Department deleted successfully."}
+
+
+@router.post("/api/admin/me/change-password", response_model=MessageResponse)
+def change_admin_password(
+    password_data: ChangePasswordRequest,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    # 验证当前密码
+    if not verify_password(password_data.current_password, current_admin.hashed_password):  # type: ignore
+        raise HTTPException(
+            status_code=400, detail="Incorrect current password.")
+
+    # 可以在这里加入新密码的复杂度验证
+
+    current_admin.hashed_password = hash_password(  # type: ignore
+        password_data.new_password)
+    current_admin.save()
+
+    return {"message": "Password updated successfully."}
+
+# 2. 安全策略 - 获取和更新
+
+
+@router.get("/api/admin/settings/security", response_model=SecuritySettings)
+def get_security_settings(current_admin: AdminUser = Depends(get_current_admin_user)):
+    """获取安全策略设置。"""
+    return settings.load_security_settings()
+
+
+@router.put("/api/admin/settings/security", response_model=MessageResponse)
+def update_security_settings(
+    settings_data: SecuritySettings,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """更新安全策略设置。"""
+    # 使用 peewee 的 insert(...).on_conflict_replace() 进行批量更新/插入
+    data_to_save = [
+        {"key": "session_duration_admin_hours", "value": str(
+            settings_data.session_duration_admin_hours)},
+        {"key": "password_min_length", "value": str(
+            settings_data.password_min_length)},
+        {"key": "password_require_uppercase", "value": str(
+            settings_data.password_require_uppercase).lower()}
+    ]
+    Setting.insert_many(data_to_save).on_conflict_replace().execute()
+    settings.invalidate()
+
+    return {"message": "Security settings updated successfully."}
+
+
+@router.post("/api/admin/clients/{client_id}/reveal-secret", response_model=ClientSecret)
+def reveal_client_secret(
+    client_id: str,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """安全地获取一个客户端的密钥。"""
+    client = Client.get_or_none(Client.client_id == client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found.")
+
+    # 仅在需要时返回密钥，不在常规列表中显示
+    return {"client_id": client.client_id, "client_secret": client.client_secret}
+
+
+@router.post("/api/admin/clients/{client_id}/reset-secret", response_model=ClientSecret)
+def reset_client_secret(
+    client_id: str,
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """为客户端重新生成一个新的密钥。"""
+    client = Client.get_or_none(Client.client_id == client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found.")
+
+    new_secret = secrets.token_hex(32)
+    client.client_secret = new_secret
+    client.save()
+
+    # 返回新生成的密钥，以便管理员可以立即复制
+    return {"client_id": client.client_id, "client_secret": new_secret}
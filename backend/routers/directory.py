@@ -0,0 +1,76 @@
+# routers/directory.py
+"""
+供下游应用（客户端平台）查询用户目录的接口。
+
+下游应用用自己的 client_id / client_secret 以 HTTP Basic 认证，一次请求最多解析
+DIRECTORY_LOOKUP_LIMIT 个用户名或 id，返回用户资料和所属部门（一次 LEFT JOIN 查询）。
+响应带 ETag 和 Cache-Control，下游应用可以缓存目录数据，到期后用 If-None-Match 重新验证。
+"""
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from peewee import JOIN
+
+from models import User, Client, Department
+from responses import cached_json_response
+from schemas import DirectoryLookup
+from security import get_current_client
+
+router = APIRouter()
+
+DIRECTORY_LOOKUP_LIMIT = 100
+DIRECTORY_CACHE_SECONDS = int(os.environ.get("DIRECTORY_CACHE_SECONDS", "300"))
+
+
+def directory_rows(usernames: list[str], ids: list[int]) -> list[dict]:
+    condition = None
+    if usernames:
+        condition = User.username.in_(usernames)
+    if ids:
+        condition = User.id.in_(ids) if condition is None else condition | User.id.in_(ids)
+    query = (User
+             .select(User.id, User.username, User.full_name, User.email, Department.id, Department.name)
+             .join(Department, JOIN.LEFT_OUTER)
+             .where(condition)
+             .order_by(User.id)
+             .tuples())
+    return [
+        {
+            "id": user_id,
+            "username": username,
+            "full_name": full_name,
+            "email": email,
+            "department": {"id": dept_id, "name": dept_name} if dept_id is not None else None
+        }
+        for user_id, username, full_name, email, dept_id, dept_name in query
+    ]
+
+
+@router.get("/api/directory/users", response_model=DirectoryLookup)
+def lookup_users(
+    request: Request,
+    username: list[str] = Query([], description="Usernames to resolve; repeat the parameter for several users."),
+    id: list[int] = Query([], description="User ids to resolve; repeat the parameter for several users."),
+    current_client: Client = Depends(get_current_client)
+):
+    """批量解析用户名或 id，返回用户资料和部门；未找到的用户名和 id 列在 not_found 中。"""
+    usernames = list(dict.fromkeys(u.strip() for u in username if u.strip()))
+    ids = list(dict.fromkeys(id))
+    if not usernames and not ids:
+        raise HTTPException(status_code=400, detail="Provide at least one username or id.")
+    if len(usernames) + len(ids) > DIRECTORY_LOOKUP_LIMIT:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {DIRECTORY_LOOKUP_LIMIT} users can be resolved per request.")
+
+    users = directory_rows(usernames, ids)
+    found_usernames = {u["username"] for u in users}
+    found_ids = {u["id"] for u in users}
+    not_found = [u for u in usernames if u not in found_usernames] + [str(i) for i in ids if i not in found_ids]
+
+    # 响应依赖于请求方的凭据，只允许客户端自身缓存
+    return cached_json_response(
+        request,
+        {"users": users, "not_found": not_found},
+        cache_control=f"private, max-age={DIRECTORY_CACHE_SECONDS}",
+        vary="Authorization",
+    )
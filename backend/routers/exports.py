@@ -0,0 +1,133 @@
+# routers/exports.py
+"""
+将用户和部门导出为 CSV 或 XLSX。
+
+导出的列与 frontend/public 中的导入模板完全一致。用户的 password 列总是留空：
+导入时已有用户不读取密码，所以导出的 XLSX 文件可以直接再导入（同步姓名和部门）。
+数据按主键分批读取（每批一次 `WHERE id > ? ORDER BY id LIMIT ?` 查询），不会把整张表载入内存，
+也不会在整个导出期间持有一个长时间的读事务：
+- CSV 边查询边输出；
+- XLSX 使用 openpyxl 的 write-only 模式写入临时文件，完成后分块输出，内存占用同样与目录规模无关。
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from typing import Iterator, Literal
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from peewee import JOIN
+
+from models import User, AdminUser, Department
+from security import get_current_admin_user
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+USER_EXPORT_COLUMNS = ["username", "email", "full_name", "password", "department_name"]
+DEPARTMENT_EXPORT_COLUMNS = ["id", "name", "parent_id", "description"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def iter_user_rows(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple]:
+    last_id = 0
+    while True:
+        batch = list(User
+                     .select(User.id, User.username, User.email, User.full_name, Department.name)
+                     .join(Department, JOIN.LEFT_OUTER)
+                     .where(User.id > last_id)
+                     .order_by(User.id)
+                     .limit(batch_size)
+                     .tuples())
+        for user_id, username, email, full_name, department_name in batch:
+            yield username, email, full_name, "", department_name or ""
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+def iter_department_rows(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple]:
+    last_id = 0
+    while True:
+        batch = list(Department
+                     .select(Department.id, Department.name, Department.parent, Department.description)
+                     .where(Department.id > last_id)
+                     .order_by(Department.id)
+                     .limit(batch_size)
+                     .tuples())
+        for dept_id, name, parent_id, description in batch:
+            yield dept_id, name, parent_id if parent_id is not None else "", description or ""
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+def stream_csv(columns: list[str], rows: Iterator[tuple], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 带 BOM，Excel 打开时才能正确识别 UTF-8 中文
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(columns: list[str], rows: Iterator[tuple]) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_response(name: str, fmt: str, columns: list[str], rows: Iterator[tuple]) -> StreamingResponse:
+    body = stream_csv(columns, rows) if fmt == "csv" else stream_xlsx(columns, rows)
+    filename = f"{name}-{date.today():%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/api/admin/users/export")
+def export_users(
+    format: Literal["csv", "xlsx"] = Query("csv"),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """导出全部 SSO 用户。"""
+    return export_response("users", format, USER_EXPORT_COLUMNS, iter_user_rows())
+
+
+@router.get("/api/admin/departments/export")
+def export_departments(
+    format: Literal["csv", "xlsx"] = Query("csv"),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """导出全部部门。"""
+    return export_response("departments", format, DEPARTMENT_EXPORT_COLUMNS, iter_department_rows())
@@ -0,0 +1,396 @@
+# routers/imports.py
+"""
+从 Excel 批量导入部门和用户。
+
+这是低频的管理功能：openpyxl 只在处理上传文件时才导入，不影响 worker 的冷启动。
+处理函数是同步函数，解析文件和写库都在线程池中执行，不会阻塞事件循环。
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from peewee import EXCLUDED
+
+import stats
+import user_versions
+from db import db
+from models import User, AdminUser, Department
+from schemas import MessageResponse, UserImportResult
+from security import get_current_admin_user, hash_password
+
+router = APIRouter()
+
+# 增量同步时每批处理的行数：每批一次查询已有用户、一次查询部门、一条 upsert 语句
+SYNC_CHUNK_SIZE = 500
+
+
+def read_excel_rows(file: UploadFile) -> tuple[list[str], list[dict[str, str]]]:
+    """
+    读取上传的 Excel 文件的第一个工作表，返回 (列名, 行)。
+    第一行视为表头；所有单元格都转换为字符串，空单元格为空字符串，跳过完全空白的行。
+    """
+    from openpyxl import load_workbook
+
+    file.file.seek(0)
+    wb = load_workbook(file.file, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(c).strip() if c is not None else "" for c in header]
+        records = []
+        for values in rows:
+            cells = ["" if v is None else str(v) for v in values]
+            if not any(c.strip() for c in cells):
+                continue
+            records.append({col: cells[i] if i < len(cells) else "" for i, col in enumerate(columns) if col})
+        return columns, records
+    finally:
+        wb.close()
+
+
+@router.post("/api/admin/departments/import", response_model=MessageResponse)
+def import_departments(
+    file: UploadFile = File(...),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """从 Excel 文件导入部门结构，此操作会覆盖所有现有部门。"""
+    if not file.filename.endswith(('.xlsx', '.xls')): # type: ignore
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an Excel file (.xlsx, .xls).")
+
+    try:
+        columns, departments_data = read_excel_rows(file)
+
+        required_columns = {'id', 'name', 'parent_id'}
+        if not required_columns.issubset(columns):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required columns. File must contain: {', '.join(required_columns)}"
+            )
+
+        with db.atomic() as transaction:
+            try:
+                User.update(department=None, version=User.version + 1).execute()
+                user_versions.invalidate()
+                Department.delete().execute()
+
+                external_id_to_new_db_id_map = {}
+
+                # --- 第一阶段：创建部门，建立映射 ---
+                for row in departments_data:
+                    external_id = str(row.get('id', '')).strip()
+                    name = str(row.get('name', '')).strip()
+
+                    if not name or not external_id:
+                        continue
+
+                    # 规范化 ID：移除可能由浮点数转换带来的 ".0"
+                    normalized_id = external_id.removesuffix('.0')
+
+                    new_dept = Department.create(
+                        name=name,
+                        description=str(row.get('description', ''))
+                    )
+                    external_id_to_new_db_id_map[normalized_id] = new_dept.id
+
+                # --- 第二阶段：更新父子关系 ---
+                for row in departments_data:
+                    external_id = str(row.get('id', '')).strip()
+                    external_parent_id = str(row.get('parent_id', '')).strip()
+
+                    if not external_id or not external_parent_id:
+                        continue
+
+                    # 对 ID 和 parent_id 使用相同的规范化方法
+                    normalized_id = external_id.removesuffix('.0')
+                    normalized_parent_id = external_parent_id.removesuffix('.0')
+
+                    new_db_id = external_id_to_new_db_id_map.get(normalized_id)
+                    new_db_parent_id = external_id_to_new_db_id_map.get(normalized_parent_id)
+
+                    if new_db_id and new_db_parent_id:
+                        dept_to_update = Department.get(Department.id == new_db_id)
+                        dept_to_update.parent = new_db_parent_id
+                        dept_to_update.save()
+
+                # 所有用户都已解除部门关联，部门人数整体重建
+                stats.rebuild_user_counters()
+
+            except Exception as e:
+                transaction.rollback()
+                raise HTTPException(status_code=500, detail=f"An error occurred during import: {e}")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to process file: {e}")
+
+    # 过滤掉没有名称的行来计算真实的导入数量
+    valid_rows = [row for row in departments_data if row.get('name', '').strip() != '']
+    return {"message": f"Successfully imported {len(valid_rows)} departments."}
+
+
+def _existing_users(usernames: set[str], emails: set[str]) -> tuple[dict, dict]:
+    """返回 (用户名 -> (full_name, department_id), 邮箱 -> 用户名)，只查询给定的用户名和邮箱。"""
+    by_username, email_owner = {}, {}
+    if usernames or emails:
+        for username, email, full_name, department_id in (
+                User.select(User.username, User.email, User.full_name, User.department)
+                .where(User.username.in_(usernames) | User.email.in_(emails))
+                .tuples()):
+            by_username[username] = (full_name, department_id)
+            email_owner[email] = username
+    return by_username, email_owner
+
+
+def _hash_new_passwords(chunk: list[tuple[int, str, str, dict]]) -> dict[int, str]:
+    """
+    在取得写锁之前为本批中的新用户计算密码哈希，返回 行号 -> 哈希。
+    bcrypt 每个哈希约 0.25 秒，放在写事务中会长时间阻塞 /authorize、/token 等写入。
+    """
+    passwords = {row_num: (username, str(row.get('password', '')).strip())
+                 for row_num, username, email, row in chunk}
+    candidates = {row_num: (username, password) for row_num, (username, password) in passwords.items()
+                  if username and password}
+    if not candidates:
+        return {}
+    existing, _ = _existing_users({username for username, _ in candidates.values()}, set())
+    return {row_num: hash_password(password) for row_num, (username, password) in candidates.items()
+            if username not in existing}
+
+
+def sync_users(users_data: list[dict[str, str]]) -> dict:
+    """
+    增量同步用户：只查询每批中出现的用户名/邮箱和部门，不预加载整个目录；
+    新增和变更的用户每批用一条 INSERT ... ON CONFLICT(username) DO UPDATE 写入。
+    与完整导入一致，已有用户只同步 full_name 和部门，不通过导入修改邮箱和密码；
+    password 只对新建的用户是必需的。
+    每批在各自的事务中提交，写锁只在写入这一批时持有；中途出错时之前的批次已经提交，
+    重新执行同一文件的同步是幂等的。
+    返回逐行的差异报告（created / updated / unchanged / error）。
+    """
+    rows_report = []
+    counts = {"created": 0, "updated": 0, "unchanged": 0, "error": 0}
+    seen_usernames = set()
+    seen_emails = set()
+
+    def report(row_num, username, status, message=None, changes=None):
+        counts[status] += 1
+        rows_report.append({"row": row_num, "username": username, "status": status,
+                            "changes": changes, "message": message})
+
+    for start in range(0, len(users_data), SYNC_CHUNK_SIZE):
+        chunk = [
+            (start + offset + 2,  # Excel 行号
+             str(row.get('username', '')).strip(),
+             str(row.get('email', '')).strip().lower(),
+             row)
+            for offset, row in enumerate(users_data[start:start + SYNC_CHUNK_SIZE])
+        ]
+        password_hashes = _hash_new_passwords(chunk)
+        usernames = {username for _, username, _, _ in chunk if username}
+        emails = {email for _, _, email, _ in chunk if email}
+        department_names = {str(row.get('department_name', '')).strip() for *_, row in chunk} - {''}
+        updated, added, moved = [], [], []
+
+        # 先读后写：以 IMMEDIATE 方式开启事务，并发的同步请求会排队等待写锁，而不是在升级读事务时直接失败
+        with db.atomic(lock_type="IMMEDIATE"):
+            existing_by_username, existing_email_owner = _existing_users(usernames, emails)
+            departments_map = dict(
+                Department.select(Department.name, Department.id)
+                .where(Department.name.in_(department_names))
+                .tuples()
+            ) if department_names else {}
+
+            upserts = []
+            for row_num, username, email, row in chunk:
+                if not username or not email:
+                    report(row_num, username, "error", "Missing username or email.")
+                    continue
+                if username in seen_usernames:
+                    report(row_num, username, "error", f"Duplicate username '{username}' in file.")
+                    continue
+
+                department_name = str(row.get('department_name', '')).strip()
+                department_id = departments_map.get(department_name) if department_name else None
+                if department_name and not department_id:
+                    report(row_num, username, "error", f"Department '{department_name}' not found.")
+                    continue
+
+                full_name = str(row.get('full_name', '')).strip()
+                existing = existing_by_username.get(username)
+
+                if existing:
+                    seen_usernames.add(username)
+                    changes = [field for field, old, new in (
+                        ("full_name", existing[0], full_name),
+                        ("department", existing[1], department_id),
+                    ) if old != new]
+                    if not changes:
+                        report(row_num, username, "unchanged")
+                        continue
+                    # 冲突分支只会更新 full_name 和 department，hashed_password 不会被写入
+                    upserts.append({"username": username, "email": email, "full_name": full_name,
+                                    "hashed_password": "", "department": department_id})
+                    moved.append((existing[1], department_id))
+                    updated.append(username)
+                    report(row_num, username, "updated", changes=changes)
+                    continue
+
+                owner = existing_email_owner.get(email)
+                if (owner and owner != username) or email in seen_emails:
+                    report(row_num, username, "error", f"Email '{email}' exists for another user.")
+                    continue
+
+                password = str(row.get('password', '')).strip()
+                if not password:
+                    report(row_num, username, "error", f"Password is required for new user '{username}'.")
+                    continue
+
+                seen_usernames.add(username)
+                seen_emails.add(email)
+                # 用户在两次查询之间被删除时才会没有预先计算的哈希
+                hashed_password = password_hashes.get(row_num) or hash_password(password)
+                upserts.append({"username": username, "email": email, "full_name": full_name,
+                                "hashed_password": hashed_password, "department": department_id})
+                added.append((department_id, None))
+                report(row_num, username, "created")
+
+            if upserts:
+                (User
+                 .insert_many(upserts)
+                 .on_conflict(
+                     conflict_target=[User.username],
+                     update={User.full_name: EXCLUDED.full_name, User.department: EXCLUDED.department_id,
+                             User.version: User.version + 1})
+                 .execute())
+            stats.users_added(added)
+            stats.users_moved(moved)
+        if updated:
+            user_versions.invalidate(*updated)
+
+    return {
+        "message": "User sync completed.",
+        "new_users": counts["created"],
+        "updated_users": counts["updated"],
+        "unchanged_users": counts["unchanged"],
+        "skipped_users": 0,
+        "errors": [f"Row {r['row']}: {r['message']}" for r in rows_report if r["status"] == "error"],
+        "rows": rows_report,
+    }
+
+
+@router.post("/api/admin/users/import", response_model=UserImportResult, response_model_exclude_none=True)
+def import_users(
+    file: UploadFile = File(...),
+    overwrite: bool = Query(False, description="If true, update existing users. Otherwise, skip them."),
+    incremental: bool = Query(False, description="If true, sync only the users in the file: look them up per chunk, "
+                                                 "upsert changes and return a per-row diff report. Implies overwrite."),
+    current_admin: AdminUser = Depends(get_current_admin_user)
+):
+    """从 Excel 文件导入用户。"""
+    if not file.filename.endswith(('.xlsx', '.xls')): # type: ignore
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an Excel file.")
+
+    try:
+        columns, users_data = read_excel_rows(file)
+
+        # 增量同步只为新建用户读取密码，缺少密码的新用户在差异报告中逐行报错；
+        # 只更新姓名或部门的表格可以不带 password 列
+        required_columns = {'username', 'email', 'full_name'}
+        if not incremental:
+            required_columns.add('password')
+        if not required_columns.issubset(columns):
+            raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(required_columns - set(columns))}")
+
+        if incremental:
+            try:
+                return sync_users(users_data)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"An error occurred during transaction: {e}")
+
+        new_users_count = 0
+        updated_users_count = 0
+        skipped_users_count = 0
+        errors = []
+
+        # 提前获取所有部门名称到ID的映射，减少数据库查询
+        departments_map = {dept.name: dept.id for dept in Department.select()}
+        # 提前获取所有现有用户的username和email，用于快速查找
+        existing_users_map = {
+            u.username: u for u in User.select()
+        }
+        existing_emails_set = {u.email for u in existing_users_map.values()}
+
+        added, moved = [], []
+        with db.atomic() as transaction:
+            try:
+                for index, row in enumerate(users_data):
+                    row_num = index + 2 # Excel 行号
+                    username = str(row.get('username', '')).strip()
+                    email = str(row.get('email', '')).strip().lower()
+
+                    if not username or not email:
+                        errors.append(f"Row {row_num}: Missing username or email.")
+                        continue
+
+                    department_name = str(row.get('department_name', '')).strip()
+                    department_id = departments_map.get(department_name) if department_name else None
+
+                    if department_name and not department_id:
+                        errors.append(f"Row {row_num}: Department '{department_name}' not found.")
+                        continue
+
+                    existing_user = existing_users_map.get(username)
+
+                    if existing_user: # 用户名已存在
+                        if overwrite:
+                            moved.append((existing_user.department_id, department_id))
+                            existing_user.full_name = str(row.get('full_name', existing_user.full_name)).strip()
+                            existing_user.department_id = department_id
+                            # 注意：我们不通过导入更新密码
+                            existing_user.save()
+                            updated_users_count += 1
+                        else:
+                            skipped_users_count += 1
+                        continue # 处理下一行
+
+                    if email in existing_emails_set: # 邮箱已存在
+                         if overwrite:
+                             errors.append(f"Row {row_num}: Email '{email}' exists for another user. Cannot update by email.")
+                         skipped_users_count += 1
+                         continue
+
+                    # 创建新用户
+                    password = str(row.get('password', '')).strip()
+                    if not password:
+                        errors.append(f"Row {row_num}: Password is required for new user '{username}'.")
+                        continue
+
+                    new_user = User.create(
+                        username=username,
+                        email=email,
+                        full_name=str(row.get('full_name', '')).strip(),
+                        hashed_password=hash_password(password),
+                        department_id=department_id
+                    )
+                    added.append((department_id, new_user.created_at))
+                    new_users_count += 1
+                    # 更新快速查找集合以处理文件内重复项
+                    existing_emails_set.add(email)
+
+                stats.users_added(added)
+                stats.users_moved(moved)
+
+            except Exception as e:
+                transaction.rollback()
+                raise HTTPException(status_code=500, detail=f"An error occurred during transaction: {e}")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to process file: {e}")
+
+    return {
+        "message": "User import process completed.",
+        "new_users": new_users_count,
+        "updated_users": updated_users_count,
+        "skipped_users": skipped_users_count,
+        "errors": errors
+    }
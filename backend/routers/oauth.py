@@ -0,0 +1,101 @@
+# routers/oauth.py
+"""
+OAuth 2.0 授权码流程：/authorize 签发授权码，/token 用授权码换取访问令牌。
+
+这两个接口是 SSO 跳转的热路径，通过 repositories 中的异步查询直接在事件循环上访问数据库，
+不占用线程池；/authorize 的回调地址由 client_registry 在内存中校验，客户端密钥仍在数据库中校验。
+"""
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Request, HTTPException, Form
+from fastapi.responses import RedirectResponse
+
+import audit
+import client_registry
+import repositories
+import stats
+from schemas import TokenResponse
+from security import get_current_user_from_sso_cookie
+from tokens import create_jwt_token
+
+router = APIRouter()
+
+
+@router.get("/authorize")
+async def authorize(request: Request, client_id: str, redirect_uri: str, response_type: str):
+    # 客户端和回调地址在进程内的注册表中校验，不访问数据库
+    if not client_registry.is_allowed_redirect(client_id, redirect_uri) or response_type != "code":
+        raise HTTPException(
+            status_code=400, detail="Invalid client or request parameters")
+
+    current_user_payload = get_current_user_from_sso_cookie(request)
+    if not current_user_payload:
+        login_url = f"http://login.nepdi.com.cn:3000/login?{request.query_params}"
+        return RedirectResponse(url=login_url)
+
+    # 从数据库获取用户
+    username = current_user_payload["sub"]
+    user_id = await repositories.get_user_id(username)
+    if not user_id:  # 安全检查，以防 JWT 中的用户已不存在
+        raise HTTPException(status_code=401, detail="User not found")
+
+    # 创建并存储授权码到数据库
+    auth_code_value = os.urandom(16).hex()
+    await repositories.create_auth_code(auth_code_value, user_id, client_id, datetime.utcnow() + timedelta(minutes=5))
+    stats.record(stats.CLIENT_LOGINS, client_id)
+    audit.record(audit.AUTHORIZE, username=username, client_id=client_id, ip_address=audit.client_ip(request))
+
+    final_redirect_uri = f"{redirect_uri}?code={auth_code_value}"
+    return RedirectResponse(url=final_redirect_uri)
+
+
+@router.post("/token", response_model=TokenResponse)
+async def exchange_code_for_token(request: Request, code: str = Form(...), client_id: str = Form(...), client_secret: str = Form(...), grant_type: str = Form(...)):
+    # 客户端凭据在数据库中校验（注册表快照可能落后于其他 worker 刚做的密钥重置）
+    expected_secret = await repositories.get_client_secret(client_id)
+    if (expected_secret is None or not secrets.compare_digest(expected_secret.encode(), client_secret.encode())
+            or grant_type != "authorization_code"):
+        audit.record(audit.TOKEN, success=False, client_id=client_id, ip_address=audit.client_ip(request),
+                     detail="invalid client credentials")
+        raise HTTPException(
+            status_code=401, detail="Invalid client credentials")
+
+    # 验证授权码并标记为已使用（一条 UPDATE ... RETURNING）
+    user_id = await repositories.consume_auth_code(code, client_id, datetime.utcnow())
+    user = await repositories.get_profile_by_id(user_id) if user_id else None
+    if not user:
+        audit.record(audit.TOKEN, success=False, client_id=client_id, ip_address=audit.client_ip(request),
+                     detail="invalid or expired authorization code")
+        raise HTTPException(
+            status_code=400, detail="Invalid or expired authorization code")
+
+    _, _, username, full_name, email, department_name = user
+
+    token_data = {
+        # 用户基本信息
+        "sub": username,
+        "name": full_name,
+        "email": email,
+
+        # --- 补充的信息 ---
+        # 部门信息 (如果用户有部门)
+        "department": department_name,
+
+        # 平台信息 (明确令牌的受众)
+        "platform": client_id, # 使用 'platform' 作为键名，比 'aud' 更直观
+        "aud": client_id,      # 同时保留标准的 'aud' 声明
+        "iss": "my-sso-system"        # 令牌颁发者
+    }
+
+    access_token = create_jwt_token(
+        data=token_data,
+        expires_delta=timedelta(days=1)
+    )
+
+
+    stats.record(stats.CLIENT_TOKENS, client_id)
+    audit.record(audit.TOKEN, username=username, client_id=client_id, ip_address=audit.client_ip(request))
+    # /token 由客户端后端直接调用，访问令牌只在响应体中返回，不替换浏览器中的 SSO 会话 Cookie
+    return {"access_token": access_token, "token_type": "bearer"}
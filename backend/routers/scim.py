@@ -0,0 +1,828 @@
+# routers/scim.py
+"""
+SCIM 2.0 开通接口（RFC 7643 / 7644），供上游 HR 系统持续推送增量变更。
+
+- /scim/v2/Users  映射到 User，部门通过企业扩展的 department 属性（部门名称）表示；
+- /scim/v2/Groups 映射到 Department，members 即该部门的用户；
+- /scim/v2/Bulk   在一个事务中批量执行多个操作，每个操作使用独立的保存点；
+- 支持 filter（eq/ne/co/sw/ew/pr，可用 and 连接）、分页、PATCH 和基于 ETag 的条件请求。
+
+认证使用环境变量 SCIM_BEARER_TOKEN 中配置的 Bearer 令牌；未配置时 SCIM 接口不可用。
+"""
+import hashlib
+import os
+import re
+import secrets
+from typing import Any
+
+import orjson
+from fastapi import APIRouter, Depends, Request, Query, Body
+from fastapi.responses import Response
+from peewee import JOIN, IntegrityError, fn
+
+import stats
+import user_versions
+from db import db
+from models import User, Department
+from responses import ORJSONResponse
+from security import hash_password
+
+SCIM_BEARER_TOKEN = os.environ.get("SCIM_BEARER_TOKEN")
+
+SCHEMA_USER = "urn:ietf:params:scim:schemas:core:2.0:User"
+SCHEMA_GROUP = "urn:ietf:params:scim:schemas:core:2.0:Group"
+SCHEMA_ENTERPRISE_USER = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"
+SCHEMA_LIST = "urn:ietf:params:scim:api:messages:2.0:ListResponse"
+SCHEMA_PATCH = "urn:ietf:params:scim:api:messages:2.0:PatchOp"
+SCHEMA_BULK_RESPONSE = "urn:ietf:params:scim:api:messages:2.0:BulkResponse"
+SCHEMA_ERROR = "urn:ietf:params:scim:api:messages:2.0:Error"
+
+MAX_RESULTS = 1000
+MAX_BULK_OPERATIONS = 1000
+MAX_BULK_PAYLOAD = 1024 * 1024
+
+# SCIM 开通的账号在设置密码之前无法登录
+UNUSABLE_PASSWORD = "!"
+
+
+class ScimResponse(ORJSONResponse):
+    media_type = "application/scim+json"
+
+
+class ScimError(Exception):
+    def __init__(self, status: int, detail: str, scim_type: str | None = None):
+        self.status = status
+        self.detail = detail
+        self.scim_type = scim_type
+
+    def to_dict(self) -> dict:
+        body = {"schemas": [SCHEMA_ERROR], "status": str(self.status), "detail": self.detail}
+        if self.scim_type:
+            body["scimType"] = self.scim_type
+        return body
+
+
+async def scim_error_handler(request: Request, exc: ScimError):
+    return ScimResponse(exc.to_dict(), status_code=exc.status)
+
+
+def require_scim_token(request: Request):
+    if not SCIM_BEARER_TOKEN:
+        raise ScimError(501, "SCIM provisioning is not configured.")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), SCIM_BEARER_TOKEN.encode()):
+        raise ScimError(401, "Invalid or missing bearer token.")
+
+
+router = APIRouter(prefix="/scim/v2", dependencies=[Depends(require_scim_token)])
+
+
+# --- 资源表示 ---
+
+
+def make_etag(resource: dict) -> str:
+    """对不含 meta 的资源内容取哈希作为弱 ETag。"""
+    content = {k: v for k, v in resource.items() if k != "meta"}
+    digest = hashlib.sha1(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _user_select():
+    return (User
+            .select(User.id, User.username, User.full_name, User.email, User.created_at,
+                    User.department.alias("department_id"), Department.name.alias("department_name"))
+            .join(Department, JOIN.LEFT_OUTER))
+
+
+def user_resource(row: dict, base_url: str) -> dict:
+    resource = {
+        "schemas": [SCHEMA_USER, SCHEMA_ENTERPRISE_USER],
+        "id": str(row["id"]),
+        "userName": row["username"],
+        "name": {"formatted": row["full_name"]},
+        "displayName": row["full_name"],
+        "emails": [{"value": row["email"], "type": "work", "primary": True}],
+        "active": True,
+        "groups": [{"value": str(row["department_id"]), "display": row["department_name"],
+                    "$ref": f"{base_url}Groups/{row['department_id']}"}] if row["department_id"] else [],
+        SCHEMA_ENTERPRISE_USER: {"department": row["department_name"]} if row["department_id"] else {},
+    }
+    resource["meta"] = {
+        "resourceType": "User",
+        "created": row["created_at"].isoformat() if hasattr(row["created_at"], "isoformat") else row["created_at"],
+        "location": f"{base_url}Users/{row['id']}",
+        "version": make_etag(resource),
+    }
+    return resource
+
+
+def load_user(user_id: str | int, base_url: str) -> dict:
+    row = _user_select().where(User.id == _parse_id(user_id)).dicts().first()
+    if not row:
+        raise ScimError(404, f"User {user_id} not found.")
+    return user_resource(row, base_url)
+
+
+def group_resource(row: dict, members: list[tuple[int, str]] | None, base_url: str) -> dict:
+    resource = {
+        "schemas": [SCHEMA_GROUP],
+        "id": str(row["id"]),
+        "displayName": row["name"],
+    }
+    if members is not None:
+        resource["members"] = [
+            {"value": str(user_id), "display": username, "$ref": f"{base_url}Users/{user_id}"}
+            for user_id, username in members
+        ]
+    resource["meta"] = {
+        "resourceType": "Group",
+        "location": f"{base_url}Groups/{row['id']}",
+        "version": make_etag(resource),
+    }
+    return resource
+
+
+def group_members(dept_ids: list[int]) -> dict[int, list[tuple[int, str]]]:
+    """一次查询取出多个部门的成员。"""
+    members = {dept_id: [] for dept_id in dept_ids}
+    if dept_ids:
+        for user_id, username, dept_id in (User
+                                           .select(User.id, User.username, User.department)
+                                           .where(User.department.in_(dept_ids))
+                                           .order_by(User.id)
+                                           .tuples()):
+            members[dept_id].append((user_id, username))
+    return members
+
+
+def load_group(group_id: str | int, base_url: str, with_members: bool = True) -> dict:
+    row = Department.select(Department.id, Department.name).where(Department.id == _parse_id(group_id)).dicts().first()
+    if not row:
+        raise ScimError(404, f"Group {group_id} not found.")
+    members = group_members([row["id"]])[row["id"]] if with_members else None
+    return group_resource(row, members, base_url)
+
+
+def _parse_id(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ScimError(404, f"Resource {value} not found.")
+
+
+# --- 过滤表达式 ---
+
+# 项中的字符串值整体匹配，值里出现的 " and " 不会被当作连接词
+_FILTER_TERM = re.compile(r'\s*([\w.:]+)\s+(eq|ne|co|sw|ew|pr)(?:\s+("(?:[^"\\]|\\.)*"|true|false|null|\d+))?', re.I)
+_FILTER_AND = re.compile(r'\s+and\s+', re.I)
+_FILTER_END = re.compile(r'\s*$')
+
+USER_FILTER_FIELDS = {
+    "username": User.username,
+    "displayname": User.full_name,
+    "name.formatted": User.full_name,
+    "emails": User.email,
+    "emails.value": User.email,
+    "id": User.id,
+    f"{SCHEMA_ENTERPRISE_USER}:department".lower(): Department.name,
+}
+GROUP_FILTER_FIELDS = {
+    "displayname": Department.name,
+    "id": Department.id,
+}
+
+
+def parse_filter(expression: str | None, fields: dict):
+    """把 `attr op "value" [and ...]` 形式的 SCIM 过滤表达式转换为 peewee 条件。"""
+    if not expression:
+        return None
+    condition = None
+    pos = 0
+    while True:
+        match = _FILTER_TERM.match(expression, pos)
+        if not match:
+            raise ScimError(400, f"Unsupported filter: {expression}", "invalidFilter")
+        term = match.group(0).strip()
+        attr, op, raw = match.group(1).lower(), match.group(2).lower(), match.group(3)
+        if attr.startswith(SCHEMA_USER.lower() + ":"):
+            attr = attr[len(SCHEMA_USER) + 1:]
+        field = fields.get(attr)
+        if field is None:
+            raise ScimError(400, f"Filtering on '{match.group(1)}' is not supported.", "invalidFilter")
+        if op != "pr" and raw is None:
+            raise ScimError(400, f"Missing value in filter: {term}", "invalidFilter")
+        value = orjson.loads(raw) if raw is not None else None
+        if field in (User.email, User.username) and isinstance(value, str):
+            # 用户名和邮箱按 SCIM 约定大小写不敏感
+            column, value = fn.LOWER(field), value.lower()
+        else:
+            column = field
+        term_condition = {
+            "eq": lambda: column == value,
+            "ne": lambda: column != value,
+            "co": lambda: column.contains(value),
+            "sw": lambda: column.startswith(value),
+            "ew": lambda: column.endswith(value),
+            "pr": lambda: field.is_null(False),
+        }[op]()
+        condition = term_condition if condition is None else condition & term_condition
+        if _FILTER_END.fullmatch(expression, match.end()):
+            return condition
+        separator = _FILTER_AND.match(expression, match.end())
+        if not separator:
+            raise ScimError(400, f"Unsupported filter: {expression}", "invalidFilter")
+        pos = separator.end()
+
+
+def list_response(resources: list[dict], total: int, start_index: int) -> dict:
+    return {
+        "schemas": [SCHEMA_LIST],
+        "totalResults": total,
+        "startIndex": start_index,
+        "itemsPerPage": len(resources),
+        "Resources": resources,
+    }
+
+
+# --- 写操作（HTTP 接口和 Bulk 共用） ---
+# 请求数据的类型在使用前检查：类型不对的属性返回 400 invalidSyntax，
+# 而不是在处理中途抛出 AttributeError（500，并回滚整个 Bulk 事务）。
+
+
+def _object(value: Any, attribute: str) -> dict:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ScimError(400, f"'{attribute}' must be an object.", "invalidSyntax")
+    return value
+
+
+def _string(value: Any, attribute: str, strip: bool = True) -> str:
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ScimError(400, f"'{attribute}' must be a string.", "invalidSyntax")
+    return value.strip() if strip else value
+
+
+def _password(value: Any) -> str:
+    # 密码按原样保存，不去掉首尾空白
+    return _string(value, "password", strip=False)
+
+
+def _patch_operations(data: dict) -> list[dict]:
+    operations = data.get("Operations") or []
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        raise ScimError(400, "'Operations' must be a list of objects.", "invalidSyntax")
+    return operations
+
+
+def _primary_email(data: dict) -> str | None:
+    emails = data.get("emails")
+    if isinstance(emails, list) and emails:
+        primary = next((e for e in emails if isinstance(e, dict) and e.get("primary")), emails[0])
+        value = primary.get("value") if isinstance(primary, dict) else primary
+        return _string(value, "emails.value").lower() or None
+    return None
+
+
+def _full_name(data: dict) -> str | None:
+    name = _object(data.get("name"), "name")
+    formatted = _string(name.get("formatted"), "name.formatted")
+    if formatted:
+        return formatted
+    parts = [_string(name.get("givenName"), "name.givenName"), _string(name.get("familyName"), "name.familyName")]
+    if any(parts):
+        return " ".join(p for p in parts if p)
+    return _string(data.get("displayName"), "displayName") or None
+
+
+def _department_id(name: Any) -> int | None:
+    name = _string(name, f"{SCHEMA_ENTERPRISE_USER}:department")
+    if not name:
+        return None
+    dept_id = Department.select(Department.id).where(Department.name == name).scalar()
+    if dept_id is None:
+        raise ScimError(400, f"Department '{name}' not found.", "invalidValue")
+    return dept_id
+
+
+def _check_active(data: dict):
+    if data.get("active") is False:
+        raise ScimError(400, "Deactivating users is not supported; use DELETE to deprovision.", "mutability")
+
+
+def _save_user(user: User):
+    try:
+        user.save()
+    except IntegrityError:
+        raise ScimError(409, "userName or email already exists.", "uniqueness")
+
+
+def create_user(data: dict) -> int:
+    _check_active(data)
+    username = _string(data.get("userName"), "userName")
+    email = _primary_email(data)
+    if not username or not email:
+        raise ScimError(400, "userName and a primary email are required.", "invalidValue")
+    enterprise = _object(data.get(SCHEMA_ENTERPRISE_USER), SCHEMA_ENTERPRISE_USER)
+    password = _password(data.get("password"))
+    user = User(
+        username=username,
+        email=email,
+        full_name=_full_name(data) or username,
+        hashed_password=hash_password(password) if password else UNUSABLE_PASSWORD,
+        department=_department_id(enterprise.get("department")),
+    )
+    _save_user(user)
+    stats.user_added(user.department_id, user.created_at)
+    return user.id
+
+
+def replace_user(user: User, data: dict):
+    old_department_id = user.department_id
+    _check_active(data)
+    username = _string(data.get("userName"), "userName")
+    email = _primary_email(data)
+    if not username or not email:
+        raise ScimError(400, "userName and a primary email are required.", "invalidValue")
+    enterprise = _object(data.get(SCHEMA_ENTERPRISE_USER), SCHEMA_ENTERPRISE_USER)
+    password = _password(data.get("password"))
+    user.username = username
+    user.email = email
+    user.full_name = _full_name(data) or user.username
+    user.department = _department_id(enterprise.get("department"))
+    if password:
+        user.hashed_password = hash_password(password)
+    _save_user(user)
+    stats.users_moved([(old_department_id, user.department_id)])
+
+
+def _apply_user_attribute(user: User, path: str, value: Any, op: str):
+    key = path.lower()
+    if key.startswith(SCHEMA_USER.lower() + ":"):
+        key = key[len(SCHEMA_USER) + 1:]
+    if key == "username":
+        username = _string(value, "userName")
+        if not username:
+            raise ScimError(400, "userName is required.", "invalidValue")
+        user.username = username
+    elif key in ("displayname", "name.formatted"):
+        full_name = _string(value, path)
+        if not full_name:
+            raise ScimError(400, f"'{path}' must not be empty.", "invalidValue")
+        user.full_name = full_name
+    elif key == "name":
+        user.full_name = _full_name({"name": value}) or user.full_name
+    elif key in ("emails", "emails.value") or key.startswith("emails["):
+        email = _primary_email({"emails": value if isinstance(value, list) else [{"value": value}]})
+        if not email:
+            raise ScimError(400, "A user must keep an email address.", "invalidValue")
+        user.email = email
+    elif key == "password":
+        password = _password(value)
+        if not password:
+            raise ScimError(400, "password must not be empty.", "invalidValue")
+        user.hashed_password = hash_password(password)
+    elif key == "active":
+        _check_active({"active": value})
+    elif key == SCHEMA_ENTERPRISE_USER.lower():
+        if isinstance(value, dict) and "department" in value:
+            user.department = _department_id(value["department"])
+    elif key == f"{SCHEMA_ENTERPRISE_USER}:department".lower():
+        user.department = None if op == "remove" else _department_id(value)
+    else:
+        raise ScimError(400, f"Unsupported attribute path '{path}'.", "invalidPath")
+
+
+def patch_user(user: User, operations: list[dict]):
+    old_department_id = user.department_id
+    for operation in operations:
+        op = str(operation.get("op", "")).lower()
+        path = _string(operation.get("path"), "path")
+        value = operation.get("value")
+        if op not in ("add", "replace", "remove"):
+            raise ScimError(400, f"Unsupported patch op '{operation.get('op')}'.", "invalidSyntax")
+        if path:
+            if op == "remove" and path.lower() not in (f"{SCHEMA_ENTERPRISE_USER}:department".lower(),):
+                raise ScimError(400, f"Attribute '{path}' cannot be removed.", "mutability")
+            _apply_user_attribute(user, path, value, op)
+        elif isinstance(value, dict):
+            for attr, attr_value in value.items():
+                _apply_user_attribute(user, attr, attr_value, op)
+        else:
+            raise ScimError(400, "Patch operation without a path needs an object value.", "invalidSyntax")
+    _save_user(user)
+    stats.users_moved([(old_department_id, user.department_id)])
+
+
+def get_user_model(user_id) -> User:
+    user = User.get_or_none(User.id == _parse_id(user_id))
+    if not user:
+        raise ScimError(404, f"User {user_id} not found.")
+    return user
+
+
+def delete_user_model(user: User):
+    user.delete_instance()
+    stats.user_removed(user.department_id)
+
+
+def _member_ids(members: Any) -> list[int]:
+    if not isinstance(members, list):
+        raise ScimError(400, "members must be a list.", "invalidValue")
+    ids = [_parse_id(m.get("value") if isinstance(m, dict) else m) for m in members]
+    existing = set(User.select(User.id).where(User.id.in_(ids)).tuples().iterator()) if ids else set()
+    missing = [i for i in ids if (i,) not in existing]
+    if missing:
+        raise ScimError(400, f"Members not found: {', '.join(map(str, missing))}.", "invalidValue")
+    return ids
+
+
+def _set_members(dept_id: int, member_ids: list[int], replace: bool):
+    """整批更新部门成员：每种变化一条 UPDATE 语句，之后按部门刷新受影响的人数计数。"""
+    affected = {dept_id, None}
+    if member_ids:
+        affected.update(department_id for department_id, in
+                        User.select(User.department).where(User.id.in_(member_ids)).distinct().tuples())
+    if replace:
+        (User.update(department=None, version=User.version + 1)
+         .where((User.department == dept_id) & (User.id.not_in(member_ids) if member_ids else True))
+         .execute())
+    if member_ids:
+        (User.update(department=dept_id, version=User.version + 1)
+         .where(User.id.in_(member_ids) & ((User.department != dept_id) | User.department.is_null()))
+         .execute())
+    stats.refresh_departments(affected)
+    user_versions.invalidate()
+
+
+def _remove_members(dept_id: int, member_ids: list[int] | None):
+    query = User.update(department=None, version=User.version + 1).where(User.department == dept_id)
+    (query.where(User.id.in_(member_ids)) if member_ids else query).execute()
+    stats.refresh_departments([dept_id, None])
+    user_versions.invalidate()
+
+
+def _save_department(dept: Department):
+    try:
+        dept.save()
+    except IntegrityError:
+        raise ScimError(409, f"Group '{dept.name}' already exists.", "uniqueness")
+
+
+def _group_name(value: Any) -> str:
+    name = _string(value, "displayName")
+    if not name:
+        raise ScimError(400, "displayName is required.", "invalidValue")
+    return name
+
+
+def create_group(data: dict) -> int:
+    name = _group_name(data.get("displayName"))
+    dept = Department(name=name)
+    _save_department(dept)
+    if data.get("members"):
+        _set_members(dept.id, _member_ids(data["members"]), replace=False)
+    return dept.id
+
+
+def replace_group(dept: Department, data: dict):
+    dept.name = _group_name(data.get("displayName"))
+    _save_department(dept)
+    _set_members(dept.id, _member_ids(data.get("members") or []), replace=True)
+
+
+_MEMBER_FILTER_PATH = re.compile(r'^members\[\s*value\s+eq\s+"([^"]+)"\s*\]$', re.I)
+
+
+def patch_group(dept: Department, operations: list[dict]):
+    for operation in operations:
+        op = str(operation.get("op", "")).lower()
+        path = _string(operation.get("path"), "path")
+        value = operation.get("value")
+        member_match = _MEMBER_FILTER_PATH.match(path)
+
+        if op in ("add", "replace") and path.lower() == "displayname":
+            dept.name = _group_name(value)
+            _save_department(dept)
+        elif op in ("add", "replace") and path.lower() == "members":
+            _set_members(dept.id, _member_ids(value or []), replace=(op == "replace"))
+        elif op == "remove" and path.lower() == "members":
+            _remove_members(dept.id, _member_ids(value) if value else None)
+        elif op == "remove" and member_match:
+            _remove_members(dept.id, [_parse_id(member_match.group(1))])
+        elif op in ("add", "replace") and not path and isinstance(value, dict):
+            if "displayName" in value:
+                dept.name = _group_name(value["displayName"])
+                _save_department(dept)
+            if "members" in value:
+                _set_members(dept.id, _member_ids(value["members"]), replace=(op == "replace"))
+        else:
+            raise ScimError(400, f"Unsupported patch operation '{op}' on '{path}'.", "invalidPath")
+
+
+def get_department_model(group_id) -> Department:
+    dept = Department.get_or_none(Department.id == _parse_id(group_id))
+    if not dept:
+        raise ScimError(404, f"Group {group_id} not found.")
+    return dept
+
+
+def delete_department(dept: Department):
+    # SQLite 未开启外键约束，手动解除用户和子部门的关联
+    User.update(department=None, version=User.version + 1).where(User.department == dept.id).execute()
+    user_versions.invalidate()
+    Department.update(parent=None).where(Department.parent == dept.id).execute()
+    dept.delete_instance()
+    stats.forget_department(dept.id)
+    stats.refresh_departments([None])
+
+
+# --- 条件请求 ---
+
+
+def check_if_match(request_etag: str | None, current: dict):
+    if request_etag and request_etag.strip() != "*" and current["meta"]["version"] not in request_etag:
+        raise ScimError(412, "Resource has been modified (ETag mismatch).")
+
+
+def resource_response(resource: dict, status_code: int = 200) -> ScimResponse:
+    headers = {"ETag": resource["meta"]["version"]}
+    if status_code == 201:
+        headers["Location"] = resource["meta"]["location"]
+    return ScimResponse(resource, status_code=status_code, headers=headers)
+
+
+def scim_base_url(request: Request) -> str:
+    return f"{str(request.base_url)}scim/v2/"
+
+
+# --- 发现接口 ---
+
+
+@router.get("/ServiceProviderConfig")
+def service_provider_config():
+    return ScimResponse({
+        "schemas": ["urn:ietf:params:scim:schemas:core:2.0:ServiceProviderConfig"],
+        "patch": {"supported": True},
+        "bulk": {"supported": True, "maxOperations": MAX_BULK_OPERATIONS, "maxPayloadSize": MAX_BULK_PAYLOAD},
+        "filter": {"supported": True, "maxResults": MAX_RESULTS},
+        "changePassword": {"supported": True},
+        "sort": {"supported": False},
+        "etag": {"supported": True},
+        "authenticationSchemes": [{"type": "oauthbearertoken", "name": "Bearer token",
+                                   "description": "Static bearer token configured via SCIM_BEARER_TOKEN"}],
+    })
+
+
+@router.get("/ResourceTypes")
+def resource_types(request: Request):
+    base_url = scim_base_url(request)
+    resources = [
+        {"schemas": ["urn:ietf:params:scim:schemas:core:2.0:ResourceType"], "id": "User", "name": "User",
+         "endpoint": "/Users", "schema": SCHEMA_USER,
+         "schemaExtensions": [{"schema": SCHEMA_ENTERPRISE_USER, "required": False}],
+         "meta": {"resourceType": "ResourceType", "location": f"{base_url}ResourceTypes/User"}},
+        {"schemas": ["urn:ietf:params:scim:schemas:core:2.0:ResourceType"], "id": "Group", "name": "Group",
+         "endpoint": "/Groups", "schema": SCHEMA_GROUP,
+         "meta": {"resourceType": "ResourceType", "location": f"{base_url}ResourceTypes/Group"}},
+    ]
+    return ScimResponse(list_response(resources, len(resources), 1))
+
+
+# --- Users ---
+
+
+@router.get("/Users")
+def list_users(
+    request: Request,
+    filter: str | None = Query(None),
+    startIndex: int = Query(1, ge=1),
+    count: int = Query(100, ge=0),
+):
+    condition = parse_filter(filter, USER_FILTER_FIELDS)
+    query = _user_select()
+    if condition is not None:
+        query = query.where(condition)
+    count = min(count, MAX_RESULTS)
+    total = query.count()
+    rows = query.order_by(User.id).offset(startIndex - 1).limit(count).dicts() if count else []
+    base_url = scim_base_url(request)
+    return ScimResponse(list_response([user_resource(row, base_url) for row in rows], total, startIndex))
+
+
+@router.get("/Users/{user_id}")
+def get_user(request: Request, user_id: str):
+    resource = load_user(user_id, scim_base_url(request))
+    if request.headers.get("If-None-Match") == resource["meta"]["version"]:
+        return Response(status_code=304, headers={"ETag": resource["meta"]["version"]})
+    return resource_response(resource)
+
+
+@router.post("/Users")
+def post_user(request: Request, data: dict = Body(...)):
+    with db.atomic():
+        user_id = create_user(data)
+    return resource_response(load_user(user_id, scim_base_url(request)), 201)
+
+
+@router.put("/Users/{user_id}")
+def put_user(request: Request, user_id: str, data: dict = Body(...)):
+    base_url = scim_base_url(request)
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_user(user_id, base_url))
+        replace_user(get_user_model(user_id), data)
+    return resource_response(load_user(user_id, base_url))
+
+
+@router.patch("/Users/{user_id}")
+def patch_user_endpoint(request: Request, user_id: str, data: dict = Body(...)):
+    base_url = scim_base_url(request)
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_user(user_id, base_url))
+        patch_user(get_user_model(user_id), _patch_operations(data))
+    return resource_response(load_user(user_id, base_url))
+
+
+@router.delete("/Users/{user_id}", status_code=204)
+def delete_user(request: Request, user_id: str):
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_user(user_id, scim_base_url(request)))
+        delete_user_model(get_user_model(user_id))
+    return Response(status_code=204)
+
+
+# --- Groups ---
+
+
+@router.get("/Groups")
+def list_groups(
+    request: Request,
+    filter: str | None = Query(None),
+    startIndex: int = Query(1, ge=1),
+    count: int = Query(100, ge=0),
+    excludedAttributes: str | None = Query(None),
+):
+    condition = parse_filter(filter, GROUP_FILTER_FIELDS)
+    query = Department.select(Department.id, Department.name)
+    if condition is not None:
+        query = query.where(condition)
+    count = min(count, MAX_RESULTS)
+    total = query.count()
+    rows = list(query.order_by(Department.id).offset(startIndex - 1).limit(count).dicts()) if count else []
+    with_members = "members" not in (excludedAttributes or "").lower()
+    members = group_members([row["id"] for row in rows]) if with_members else {}
+    base_url = scim_base_url(request)
+    resources = [group_resource(row, members.get(row["id"]) if with_members else None, base_url) for row in rows]
+    return ScimResponse(list_response(resources, total, startIndex))
+
+
+@router.get("/Groups/{group_id}")
+def get_group(request: Request, group_id: str, excludedAttributes: str | None = Query(None)):
+    with_members = "members" not in (excludedAttributes or "").lower()
+    resource = load_group(group_id, scim_base_url(request), with_members)
+    if request.headers.get("If-None-Match") == resource["meta"]["version"]:
+        return Response(status_code=304, headers={"ETag": resource["meta"]["version"]})
+    return resource_response(resource)
+
+
+@router.post("/Groups")
+def post_group(request: Request, data: dict = Body(...)):
+    with db.atomic(lock_type="IMMEDIATE"):
+        group_id = create_group(data)
+    return resource_response(load_group(group_id, scim_base_url(request)), 201)
+
+
+@router.put("/Groups/{group_id}")
+def put_group(request: Request, group_id: str, data: dict = Body(...)):
+    base_url = scim_base_url(request)
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_group(group_id, base_url))
+        replace_group(get_department_model(group_id), data)
+    return resource_response(load_group(group_id, base_url))
+
+
+@router.patch("/Groups/{group_id}")
+def patch_group_endpoint(request: Request, group_id: str, data: dict = Body(...)):
+    base_url = scim_base_url(request)
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_group(group_id, base_url))
+        patch_group(get_department_model(group_id), _patch_operations(data))
+    # 按 RFC 7644，没有请求返回资源时可以用 204；这里返回更新后的资源，方便调用方拿到新的 ETag
+    return resource_response(load_group(group_id, base_url))
+
+
+@router.delete("/Groups/{group_id}", status_code=204)
+def delete_group(request: Request, group_id: str):
+    with db.atomic(lock_type="IMMEDIATE"):
+        check_if_match(request.headers.get("If-Match"), load_group(group_id, scim_base_url(request), False))
+        delete_department(get_department_model(group_id))
+    return Response(status_code=204)
+
+
+# --- Bulk ---
+
+_BULK_PATH = re.compile(r"^/(Users|Groups)(?:/([^/]+))?$")
+
+
+def _resolve_bulk_ids(value: Any, bulk_ids: dict[str, str]) -> Any:
+    """把请求数据中的 "bulkId:xxx" 引用替换为同一批次中已创建资源的 id。"""
+    if isinstance(value, str) and value.startswith("bulkId:"):
+        ref = value[len("bulkId:"):]
+        if ref not in bulk_ids:
+            raise ScimError(409, f"Unresolved bulkId reference '{ref}'.", "invalidValue")
+        return bulk_ids[ref]
+    if isinstance(value, list):
+        return [_resolve_bulk_ids(v, bulk_ids) for v in value]
+    if isinstance(value, dict):
+        return {k: _resolve_bulk_ids(v, bulk_ids) for k, v in value.items()}
+    return value
+
+
+def _run_bulk_operation(operation: dict, bulk_ids: dict[str, str], base_url: str) -> dict:
+    method = str(operation.get("method", "")).upper()
+    match = _BULK_PATH.match(_string(operation.get("path"), "path"))
+    if not match:
+        raise ScimError(400, f"Invalid bulk operation path '{operation.get('path')}'.", "invalidPath")
+    resource_type, resource_id = match.groups()
+    is_user = resource_type == "Users"
+    data = _resolve_bulk_ids(_object(operation.get("data"), "data"), bulk_ids)
+    if resource_id:
+        resource_id = _resolve_bulk_ids(resource_id, bulk_ids)
+    load = load_user if is_user else load_group
+
+    if method == "POST" and not resource_id:
+        new_id = str(create_user(data) if is_user else create_group(data))
+        if operation.get("bulkId"):
+            bulk_ids[operation["bulkId"]] = new_id
+        resource = load(new_id, base_url)
+        return {"status": "201", "location": resource["meta"]["location"], "version": resource["meta"]["version"]}
+
+    if not resource_id:
+        raise ScimError(400, f"{method} requires a resource id.", "invalidPath")
+    check_if_match(operation.get("version"), load(resource_id, base_url))
+    if method == "PUT":
+        replace_user(get_user_model(resource_id), data) if is_user else replace_group(get_department_model(resource_id), data)
+    elif method == "PATCH":
+        ops = _patch_operations(data)
+        patch_user(get_user_model(resource_id), ops) if is_user else patch_group(get_department_model(resource_id), ops)
+    elif method == "DELETE":
+        delete_user_model(get_user_model(resource_id)) if is_user else delete_department(get_department_model(resource_id))
+        return {"status": "204", "location": f"{base_url}{resource_type}/{resource_id}"}
+    else:
+        raise ScimError(400, f"Unsupported bulk method '{method}'.", "invalidSyntax")
+    resource = load(resource_id, base_url)
+    return {"status": "200", "location": resource["meta"]["location"], "version": resource["meta"]["version"]}
+
+
+@router.post("/Bulk")
+async def bulk(request: Request):
+    body = await request.body()
+    if len(body) > MAX_BULK_PAYLOAD:
+        raise ScimError(413, f"Bulk payload exceeds {MAX_BULK_PAYLOAD} bytes.", "tooLarge")
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise ScimError(400, "Request body is not valid JSON.", "invalidSyntax")
+    if not isinstance(data, dict):
+        raise ScimError(400, "Bulk request must be a JSON object.", "invalidSyntax")
+    operations = data.get("Operations") or []
+    if not isinstance(operations, list):
+        raise ScimError(400, "'Operations' must be a list.", "invalidSyntax")
+    fail_on_errors = data.get("failOnErrors")
+    if fail_on_errors is not None and (type(fail_on_errors) is not int or fail_on_errors < 1):
+        raise ScimError(400, "'failOnErrors' must be a positive integer.", "invalidSyntax")
+    if len(operations) > MAX_BULK_OPERATIONS:
+        raise ScimError(413, f"Bulk request exceeds {MAX_BULK_OPERATIONS} operations.", "tooMany")
+    from starlette.concurrency import run_in_threadpool
+    results = await run_in_threadpool(_run_bulk, operations, fail_on_errors, scim_base_url(request))
+    return ScimResponse({"schemas": [SCHEMA_BULK_RESPONSE], "Operations": results})
+
+
+def _run_bulk(operations: list[dict], fail_on_errors: int | None, base_url: str) -> list[dict]:
+    """
+    所有操作在同一个事务中执行，只提交一次；每个操作有独立的保存点，
+    失败的操作只回滚自身。错误数达到 failOnErrors 时停止处理剩余操作。
+    """
+    results = []
+    bulk_ids: dict[str, str] = {}
+    errors = 0
+    with db.atomic(lock_type="IMMEDIATE"):
+        for operation in operations:
+            result = {}
+            try:
+                if not isinstance(operation, dict):
+                    raise ScimError(400, "Bulk operation must be an object.", "invalidSyntax")
+                result["method"] = str(operation.get("method", "")).upper()
+                if operation.get("bulkId"):
+                    result["bulkId"] = _string(operation["bulkId"], "bulkId")
+                with db.atomic():
+                    result.update(_run_bulk_operation(operation, bulk_ids, base_url))
+            except ScimError as e:
+                errors += 1
+                result.update({"status": str(e.status), "response": e.to_dict()})
+            results.append(result)
+            if fail_on_errors and errors >= fail_on_errors:
+                break
+    return results
@@ -0,0 +1,103 @@
+# routers/users.py
+"""
+SSO 用户自身使用的接口：登录和获取个人信息。
+
+/api/me（会话 Cookie）和 /userinfo（Bearer 访问令牌）的响应带有由 User.version 生成的 ETag，
+前端每次导航时带 If-None-Match 轮询，版本未变时由进程内的版本缓存直接返回 304。
+这些接口都通过 repositories 中的异步查询访问数据库；bcrypt 校验在线程池中执行，不阻塞事件循环。
+"""
+from datetime import timedelta
+
+from fastapi import APIRouter, Request, Response, HTTPException, Form
+from starlette.concurrency import run_in_threadpool
+
+import audit
+import repositories
+import user_versions
+from responses import ORJSONResponse, etag_matches
+from schemas import MessageResponse, UserProfile, UserInfo
+from security import verify_password, get_current_user_from_sso_cookie, get_current_user_from_bearer_token
+from tokens import SSO_SESSION_COOKIE, SESSION_COOKIE_OPTIONS, create_jwt_token
+
+router = APIRouter()
+
+# 浏览器可以缓存响应，但每次使用前都必须用 If-None-Match 重新验证
+PROFILE_CACHE_CONTROL = "private, no-cache"
+
+
+@router.post("/api/login", response_model=MessageResponse)
+async def login(request: Request, response: Response, username: str = Form(...), password: str = Form(...)):
+    # 从数据库查找用户
+    user = await repositories.get_login_user(username)
+    if not user or not await run_in_threadpool(verify_password, password, user[3]):
+        audit.record(audit.LOGIN, success=False, username=username, ip_address=audit.client_ip(request))
+        raise HTTPException(
+            status_code=400, detail="Incorrect username or password")
+
+    sso_session_token = create_jwt_token(
+        data={"sub": user[1], "email": user[2]},
+        expires_delta=timedelta(days=1)
+    )
+    response.set_cookie(key=SSO_SESSION_COOKIE, value=sso_session_token, **SESSION_COOKIE_OPTIONS)
+    audit.record(audit.LOGIN, username=user[1], ip_address=audit.client_ip(request))
+    return {"message": "Login successful"}
+
+
+async def not_modified(request: Request, username: str) -> Response | None:
+    """If-None-Match 与用户当前版本一致时返回 304；缓存未命中时只查询 id 和 version。"""
+    if not request.headers.get("If-None-Match"):
+        return None
+    cached = user_versions.get(username)
+    if cached is None:
+        cached = await repositories.get_user_version(username)
+        if cached is None:
+            return None
+        user_versions.put(username, *cached)
+    etag = user_versions.make_etag(*cached)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PROFILE_CACHE_CONTROL})
+    return None
+
+
+async def profile_response(username: str, render, unauthorized: HTTPException) -> Response:
+    # 为了安全，我们从数据库再次获取用户信息，而不是完全信任令牌
+    row = await repositories.get_profile(username)
+    if not row:
+        raise unauthorized
+    user_id, version = row[0], row[1]
+    user_versions.put(username, user_id, version)
+    return ORJSONResponse(render(*row[2:]), headers={
+        "ETag": user_versions.make_etag(user_id, version),
+        "Cache-Control": PROFILE_CACHE_CONTROL,
+    })
+
+
+@router.get("/api/me", response_model=UserProfile)
+async def get_user_profile(request: Request):
+    user_payload = get_current_user_from_sso_cookie(request)
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    username = user_payload['sub']
+    return await not_modified(request, username) or await profile_response(
+        username,
+        lambda username, full_name, email, department: {"sub": username, "email": email, "full_name": full_name},
+        HTTPException(status_code=401, detail="User not found"),
+    )
+
+
+@router.get("/userinfo", response_model=UserInfo)
+async def get_userinfo(request: Request):
+    """OIDC 风格的 userinfo 接口，以 /token 签发的访问令牌作为 Bearer 凭据。"""
+    invalid_token = HTTPException(status_code=401, detail="Invalid or missing access token",
+                                  headers={"WWW-Authenticate": 'Bearer error="invalid_token"'})
+    token_payload = get_current_user_from_bearer_token(request)
+    if not token_payload:
+        raise invalid_token
+    username = token_payload["sub"]
+    return await not_modified(request, username) or await profile_response(
+        username,
+        lambda username, full_name, email, department: {
+            "sub": username, "name": full_name, "email": email, "department": department,
+        },
+        invalid_token,
+    )
@@ -0,0 +1,208 @@
+# schemas.py
+"""请求/响应使用的 Pydantic 模型。"""
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, EmailStr, Field, HttpUrl
+
+
+class UserCreate(BaseModel):
+    username: str
+    full_name: str
+    email: EmailStr
+    password: str
+    department_id: int | None = None
+
+
+class PasswordReset(BaseModel):
+    new_password: str
+
+
+class UserUpdate(BaseModel):
+    full_name: str
+    email: EmailStr
+    department_id: int | None = None
+    password: str | None = None  # 密码可选，不提供则不更新
+
+
+class ClientCreate(BaseModel):
+    client_id: str
+    redirect_uri: HttpUrl  # 使用 HttpUrl 类型进行验证
+    redirect_uris: list[HttpUrl] = []  # 额外允许的回调地址
+    allowed_origins: list[str] = []  # 允许跨域访问的前端来源，如 https://app.example.com
+
+
+class ClientUpdate(BaseModel):
+    redirect_uri: HttpUrl
+    # 为 None 时保持不变
+    redirect_uris: list[HttpUrl] | None = None
+    allowed_origins: list[str] | None = None
+
+
+class DepartmentCreate(BaseModel):
+    name: str
+    description: str | None = None
+    parent_id: int | None = None
+
+
+class DepartmentUpdate(BaseModel):
+    name: str
+    description: str | None = None
+    parent_id: int | None = None
+
+
+class ChangePasswordRequest(BaseModel):
+    current_password: str
+    new_password: str
+
+
+class SecuritySettings(BaseModel):
+    session_duration_admin_hours: int = Field(
+        ..., ge=1, description="Admin session duration in hours")
+    password_min_length: int = Field(..., ge=8,
+                                     description="Minimum password length")
+    password_require_uppercase: bool
+
+
+# --- 响应模型 ---
+
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+class UserProfile(BaseModel):
+    sub: str
+    email: str
+    full_name: str
+
+
+class UserInfo(BaseModel):
+    sub: str
+    name: str
+    email: str
+    department: str | None = None
+
+
+class AdminProfile(UserProfile):
+    role: str
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str
+
+
+class UserStats(BaseModel):
+    total_users: int
+    new_users_last_7_days: int
+
+
+class DepartmentUsers(BaseModel):
+    department_id: int | None = None
+    name: str | None = None
+    users: int
+
+
+class StatsTimeSeries(BaseModel):
+    days: list[str]
+    total_users: int
+    signups: list[int]
+    logins: dict[str, list[int]]
+    token_exchanges: dict[str, list[int]]
+    departments: list[DepartmentUsers]
+
+
+class AuditEventOut(BaseModel):
+    id: int
+    created_at: datetime
+    event: str
+    success: bool
+    username: str | None = None
+    client_id: str | None = None
+    ip_address: str | None = None
+    detail: str | None = None
+
+
+class AuditPage(BaseModel):
+    items: list[AuditEventOut]
+    next_cursor: str | None = None
+
+
+class DepartmentRef(BaseModel):
+    id: int
+    name: str
+
+
+class UserOut(BaseModel):
+    id: int
+    username: str
+    full_name: str
+    email: str
+    created_at: datetime
+    department: DepartmentRef | None = None
+
+
+class DirectoryUser(BaseModel):
+    id: int
+    username: str
+    full_name: str
+    email: str
+    department: DepartmentRef | None = None
+
+
+class DirectoryLookup(BaseModel):
+    users: list[DirectoryUser]
+    not_found: list[str]
+
+
+class UserPage(BaseModel):
+    items: list[UserOut]
+    total: int
+    page: int
+    page_size: int
+
+
+class UserCreated(MessageResponse):
+    user_id: int
+
+
+class ClientOut(BaseModel):
+    client_id: str
+    redirect_uri: str
+    redirect_uris: list[str] = []  # 全部允许的回调地址，包括 redirect_uri
+    allowed_origins: list[str] = []
+
+
+class ClientSecret(BaseModel):
+    client_id: str
+    client_secret: str
+
+
+class ClientCreated(ClientOut):
+    client_secret: str
+
+
+class DepartmentOut(BaseModel):
+    id: int
+    name: str
+    description: str | None = None
+    parent_id: int | None = None
+
+
+class UserImportRow(BaseModel):
+    row: int
+    username: str
+    status: Literal["created", "updated", "unchanged", "error"]
+    changes: list[str] | None = None
+    message: str | None = None
+
+
+class UserImportResult(MessageResponse):
+    new_users: int
+    updated_users: int
+    skipped_users: int
+    errors: list[str]
+    # 以下字段仅在增量同步模式下返回
+    unchanged_users: int | None = None
+    rows: list[UserImportRow] | None = None
@@ -0,0 +1,102 @@
+# security.py
+"""
+密码相关的工具函数，以及 FastAPI 的认证依赖（JWT 和会话 Cookie 见 tokens.py）。
+
+passlib 的导入开销不小，而且只有在处理请求时才需要，所以在第一次使用时才导入，以缩短 worker 的冷启动时间。
+"""
+import base64
+import binascii
+import secrets
+
+from fastapi import Request, HTTPException
+
+import sessions
+from models import AdminUser, Client
+from tokens import SSO_SESSION_COOKIE, ADMIN_SESSION_COOKIE, decode_jwt_token
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """密码上下文，第一次调用时创建。"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    try:
+        return get_pwd_context().verify(password, hashed_password)
+    except ValueError:
+        # 无法识别的哈希（例如通过 SCIM 开通、尚未设置密码的账号）一律视为不匹配
+        return False
+
+
+# --- 认证依赖 ---
+
+
+def get_current_user_from_sso_cookie(request: Request):
+    sso_token = request.cookies.get(SSO_SESSION_COOKIE)
+    if not sso_token:
+        return None
+    payload = decode_jwt_token(sso_token)
+    if payload and payload.get("sub"):
+        return payload
+    return None
+
+
+def get_current_user_from_bearer_token(request: Request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    # Bearer 凭据是 /token 签发给某个客户端的访问令牌，aud 由下游应用自行校验
+    payload = decode_jwt_token(token, verify_audience=False)
+    if payload and payload.get("sub"):
+        return payload
+    return None
+
+
+def get_current_client(request: Request) -> Client:
+    """
+    以 client_credentials 方式认证下游应用：HTTP Basic，用户名为 client_id，密码为 client_secret。
+    """
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    client_id = client_secret = None
+    if scheme.lower() == "basic":
+        try:
+            client_id, _, client_secret = base64.b64decode(credentials).decode().partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            pass
+    client = Client.get_or_none(Client.client_id == client_id) if client_id else None
+    if not client or not secrets.compare_digest(client.client_secret.encode(), (client_secret or "").encode()):
+        raise HTTPException(status_code=401, detail="Invalid client credentials",
+                            headers={"WWW-Authenticate": 'Basic realm="sso"'})
+    return client
+
+
+def get_current_admin_user(request: Request):
+    """
+    从名为 ADMIN_SESSION_COOKIE 的 Cookie 中获取 JWT，
+    并验证用户是否有 'admin' 角色。
+    """
+    admin_token = request.cookies.get(ADMIN_SESSION_COOKIE)
+    if not admin_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    payload = decode_jwt_token(admin_token)
+    if not payload or payload.get("role") != "admin" or not payload.get("sub"):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    admin = AdminUser.get_or_none(AdminUser.username == payload["sub"])
+    if not admin:
+        raise HTTPException(status_code=401, detail="Admin user not found")
+
+    # 活跃的会话在过半后滑动续期，新 Cookie 由 AdminSessionRenewalMiddleware 写入响应
+    sessions.schedule_renewal(request, payload)
+    return admin
@@ -0,0 +1,103 @@
+# server.py
+"""
+生产环境启动入口。
+
+    python -m backend serve --port 8000          # 在仓库根目录
+    python server.py serve --port 8000           # 在 backend 目录
+
+worker 数默认取可用 CPU 数（可通过 WEB_CONCURRENCY 覆盖），
+安装了 uvloop / httptools 时自动启用。
+uvicorn 以 spawn 方式启动 worker，每个 worker 各自导入应用，与主进程不共享内存（没有预加载）。
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_workers() -> int:
+    if os.environ.get("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    try:
+        # 遵循容器/taskset 的 CPU 亲和性限制
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus)
+
+
+def detect_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def detect_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+_IMPORT_CHECK = """
+import time
+start = time.perf_counter()
+import main
+print(f"App import check passed in {(time.perf_counter() - start) * 1000:.0f} ms")
+"""
+
+
+def check_app_import():
+    """
+    启动 worker 之前在子进程中导入一次应用：配置或依赖有问题时直接失败，而不是让每个 worker 反复崩溃。
+    只是检查，不是预加载——worker 由 spawn 启动，不继承任何已导入的模块；
+    放在子进程中执行，主进程也不会因此多占内存。
+    """
+    result = subprocess.run([sys.executable, "-c", _IMPORT_CHECK], cwd=BACKEND_DIR)
+    if result.returncode != 0:
+        sys.exit(f"Failed to import the app (exit code {result.returncode}); not starting workers.")
+
+
+def serve(host: str, port: int, workers: int, graceful_timeout: int, log_level: str):
+    import uvicorn
+
+    loop, http = detect_loop(), detect_http()
+    # 无论从哪个目录启动，默认都使用 backend/sso.db；worker 进程继承该环境变量
+    os.environ.setdefault("SSO_DB_PATH", os.path.join(BACKEND_DIR, "sso.db"))
+    check_app_import()
+    print(f"Starting {workers} worker(s) on {host}:{port} (loop={loop}, http={http})")
+    uvicorn.run(
+        "main:app",
+        app_dir=BACKEND_DIR,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        # 收到 SIGTERM 后停止接受新连接，最多等待 graceful_timeout 秒让在途请求完成
+        timeout_graceful_shutdown=graceful_timeout,
+        proxy_headers=True,
+        log_level=log_level,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend", description="Simple-SSO backend")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subcommands.add_parser("serve", help="run the production server")
+    serve_parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    serve_parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    serve_parser.add_argument("--workers", type=int, default=default_workers(),
+                              help="worker processes (default: CPU count or WEB_CONCURRENCY)")
+    serve_parser.add_argument("--graceful-timeout", type=int, default=30,
+                              help="seconds to drain in-flight requests on shutdown")
+    serve_parser.add_argument("--log-level", default="info")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.graceful_timeout, args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# sessions.py
+"""
+管理员会话的签发与滑动续期。
+
+会话时长取自安全设置中的 session_duration_admin_hours（见 settings.py 的缓存）。
+管理员持续操作时，get_current_admin_user 发现令牌剩余有效期不足一半，就用已经验证过的令牌内容
+签发一个新令牌放进 request.state；AdminSessionRenewalMiddleware 在响应头中写入新的 Cookie。
+续期不需要再次校验密码，活跃的管理员也不会在会话中途突然遇到一连串 401。
+"""
+import time
+from datetime import timedelta
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import settings
+from tokens import ADMIN_SESSION_COOKIE, SESSION_COOKIE_OPTIONS, create_jwt_token, session_cookie_header
+
+RENEWAL_STATE_KEY = "admin_session_renewal"
+
+
+def admin_session_duration() -> timedelta:
+    return timedelta(hours=settings.get_security_settings().session_duration_admin_hours)
+
+
+def issue_admin_session(response: Response, username: str, email: str):
+    duration = admin_session_duration()
+    token = create_jwt_token(data={"sub": username, "email": email, "role": "admin"}, expires_delta=duration)
+    set_admin_cookie(response, token, duration)
+
+
+def set_admin_cookie(response: Response, token: str, duration: timedelta):
+    response.set_cookie(
+        key=ADMIN_SESSION_COOKIE,
+        value=token,
+        max_age=int(duration.total_seconds()),
+        **SESSION_COOKIE_OPTIONS
+    )
+
+
+def schedule_renewal(request: Request, payload: dict):
+    """令牌剩余有效期不足会话时长的一半时，为本次响应安排一个新令牌。"""
+    duration = admin_session_duration()
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining >= duration.total_seconds() / 2:
+        return
+    token = create_jwt_token(
+        data={"sub": payload["sub"], "email": payload.get("email"), "role": "admin"},
+        expires_delta=duration,
+    )
+    setattr(request.state, RENEWAL_STATE_KEY,
+            session_cookie_header(ADMIN_SESSION_COOKIE, token, int(duration.total_seconds())))
+
+
+class AdminSessionRenewalMiddleware:
+    """
+    纯 ASGI 中间件：响应开始时检查 request.state 中是否有续期的 Cookie，有则追加 Set-Cookie 头。
+    不读取请求体也不缓冲响应，对其他请求只多一次字典查找。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # 保证下游拿到的是同一个 state 字典，响应时才能读到处理函数写入的值
+        state = scope.setdefault("state", {})
+
+        async def send_with_renewal(message):
+            if message["type"] == "http.response.start":
+                renewal = state.get(RENEWAL_STATE_KEY)
+                if renewal:
+                    message["headers"] = [*message.get("headers", []), renewal]
+            await send(message)
+
+        await self.app(scope, receive, send_with_renewal)
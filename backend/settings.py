@@ -0,0 +1,45 @@
+# settings.py
+"""
+安全策略设置的进程内缓存。
+
+管理员会话时长等设置在每次管理员请求（会话续期）时都会用到，这里缓存 Setting 表的内容，
+最多 SETTINGS_CACHE_SECONDS 秒重新读取一次；本进程内更新设置后立即失效。
+"""
+import os
+import threading
+import time
+
+from models import Setting
+from schemas import SecuritySettings
+
+SETTINGS_CACHE_SECONDS = float(os.environ.get("SETTINGS_CACHE_SECONDS", "30"))
+
+_cached: SecuritySettings | None = None
+_expires_at = 0.0
+_lock = threading.Lock()
+
+
+def load_security_settings() -> SecuritySettings:
+    settings = dict(Setting.select(Setting.key, Setting.value).tuples())
+    # 从数据库字符串转换为正确的类型，并提供默认值
+    return SecuritySettings(
+        session_duration_admin_hours=int(settings.get("session_duration_admin_hours", 8)),
+        password_min_length=int(settings.get("password_min_length", 8)),
+        password_require_uppercase=settings.get("password_require_uppercase", "true").lower() == "true"
+    )
+
+
+def get_security_settings() -> SecuritySettings:
+    global _cached, _expires_at
+    if _cached is None or time.monotonic() >= _expires_at:
+        with _lock:
+            if _cached is None or time.monotonic() >= _expires_at:
+                _cached = load_security_settings()
+                _expires_at = time.monotonic() + SETTINGS_CACHE_SECONDS
+    return _cached
+
+
+def invalidate():
+    global _cached
+    with _lock:
+        _cached = None
@@ -0,0 +1,236 @@
+# stats.py
+"""
+仪表盘统计：在写路径上增量维护计数器，读取时不再扫描 User 表。
+
+计数器存放在 StatCounter 表中，分两类维护：
+- 用户相关的计数（总用户数、每日新增、各部门人数）在用户写入的同一个事务中同步更新，始终与 User 表一致；
+- 登录和令牌交换是高频的热路径，先在进程内累加，由 lifespan 启动的后台任务定期
+  合并成一条 upsert 写入。多个 worker 各自累加增量，写入时相加，互不覆盖。
+
+时间序列接口只读取所请求天数内的计数行，开销与历史长度无关。
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from peewee import EXCLUDED, fn
+
+from db import db
+from models import StatCounter, User, Department
+
+# 指标名
+USERS_TOTAL = "users.total"
+USER_SIGNUPS = "users.signups"
+USERS_BY_DEPARTMENT = "users.department"
+CLIENT_LOGINS = "client.logins"
+CLIENT_TOKENS = "client.tokens"
+
+FLUSH_INTERVAL_SECONDS = 10
+
+logger = logging.getLogger("uvicorn.error")
+
+_pending: Counter = Counter()
+_pending_lock = threading.Lock()
+
+
+def _day(value: datetime | date | None = None) -> str:
+    return (value or date.today()).strftime("%Y-%m-%d")
+
+
+def _department_key(department_id: int | None) -> str:
+    return "" if department_id is None else str(department_id)
+
+
+def _upsert(deltas: dict[tuple[str, str, str], int], replace: bool = False):
+    rows = [{"metric": metric, "key": key, "day": day, "value": value}
+            for (metric, key, day), value in deltas.items() if value or replace]
+    if not rows:
+        return
+    value = EXCLUDED.value if replace else StatCounter.value + EXCLUDED.value
+    for start in range(0, len(rows), 500):
+        (StatCounter
+         .insert_many(rows[start:start + 500])
+         .on_conflict(conflict_target=[StatCounter.metric, StatCounter.key, StatCounter.day],
+                      update={StatCounter.value: value})
+         .execute())
+
+
+# --- 用户计数：在写事务中同步更新 ---
+
+
+def users_added(users: Iterable[tuple[int | None, datetime | None]]):
+    """记录新增的用户，users 为 (department_id, created_at) 序列。"""
+    deltas = Counter()
+    for department_id, created_at in users:
+        deltas[(USERS_TOTAL, "", "")] += 1
+        deltas[(USER_SIGNUPS, "", _day(created_at))] += 1
+        deltas[(USERS_BY_DEPARTMENT, _department_key(department_id), "")] += 1
+    _upsert(deltas)
+
+
+def user_added(department_id: int | None, created_at: datetime | None = None):
+    users_added([(department_id, created_at)])
+
+
+def user_removed(department_id: int | None):
+    # 每日新增是事件计数，删除用户不会改写历史
+    _upsert({(USERS_TOTAL, "", ""): -1, (USERS_BY_DEPARTMENT, _department_key(department_id), ""): -1})
+
+
+def users_moved(moves: Iterable[tuple[int | None, int | None]]):
+    """记录用户的部门变更，moves 为 (原部门 id, 新部门 id) 序列。"""
+    deltas = Counter()
+    for old, new in moves:
+        if old != new:
+            deltas[(USERS_BY_DEPARTMENT, _department_key(old), "")] -= 1
+            deltas[(USERS_BY_DEPARTMENT, _department_key(new), "")] += 1
+    _upsert(deltas)
+
+
+def refresh_departments(department_ids: Iterable[int | None]):
+    """
+    按部门重新统计人数，用于成员被整批 UPDATE 的场景（例如 SCIM 组成员变更）。
+    每个部门一次按索引的计数查询，与用户总数无关。
+    """
+    counts = {}
+    for department_id in set(department_ids):
+        condition = User.department.is_null() if department_id is None else User.department == department_id
+        counts[(USERS_BY_DEPARTMENT, _department_key(department_id), "")] = User.select().where(condition).count()
+    _upsert(counts, replace=True)
+
+
+def forget_department(department_id: int):
+    StatCounter.delete().where((StatCounter.metric == USERS_BY_DEPARTMENT)
+                               & (StatCounter.key == _department_key(department_id))).execute()
+
+
+def rebuild_user_counters():
+    """从 User 表重建全部用户计数。用于建库、升级和整表导入，调用方负责事务。"""
+    StatCounter.delete().where(StatCounter.metric.in_([USERS_TOTAL, USER_SIGNUPS, USERS_BY_DEPARTMENT])).execute()
+    deltas = {(USERS_TOTAL, "", ""): User.select().count()}
+    signup_day = fn.strftime("%Y-%m-%d", User.created_at)
+    for day, count in User.select(signup_day, fn.COUNT(User.id)).group_by(signup_day).tuples():
+        deltas[(USER_SIGNUPS, "", day)] = count
+    for department_id, count in User.select(User.department, fn.COUNT(User.id)).group_by(User.department).tuples():
+        deltas[(USERS_BY_DEPARTMENT, _department_key(department_id), "")] = count
+    _upsert(deltas, replace=True)
+
+
+# --- 登录与令牌交换：进程内累加，后台合并写入 ---
+
+
+def record(metric: str, key: str = "", amount: int = 1):
+    """在进程内累加一次事件，不访问数据库。"""
+    with _pending_lock:
+        _pending[(metric, key, _day())] += amount
+
+
+def flush():
+    """把进程内累加的增量写入数据库。写入失败时增量放回，下次再试。"""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, Counter()
+    if not pending:
+        return
+    try:
+        with db.connection_context(), db.atomic():
+            _upsert(pending)
+    except Exception:
+        with _pending_lock:
+            _pending.update(pending)
+        raise
+
+
+async def run_flusher(interval: float = FLUSH_INTERVAL_SECONDS):
+    """lifespan 中启动的后台任务：定期合并写入计数，被取消时再写入一次。"""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(flush)
+            except Exception:
+                logger.exception("Failed to flush stat counters")
+    finally:
+        await asyncio.to_thread(flush)
+
+
+def ensure_counters():
+    """启动时调用：计数为空时（新建的计数表或刚升级的数据库）从 User 表重建一次。"""
+    with db.connection_context():
+        if not StatCounter.select().where(StatCounter.metric == USERS_TOTAL).exists():
+            # 多个 worker 同时启动时依次重建，结果相同
+            with db.atomic(lock_type="IMMEDIATE"):
+                rebuild_user_counters()
+
+
+# --- 读取 ---
+
+
+def total_users() -> int:
+    return (StatCounter
+            .select(StatCounter.value)
+            .where((StatCounter.metric == USERS_TOTAL) & (StatCounter.key == "") & (StatCounter.day == ""))
+            .scalar()) or 0
+
+
+def _days(days: int) -> list[str]:
+    today = date.today()
+    return [_day(today - timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+
+
+def new_users(days: int) -> int:
+    return (StatCounter
+            .select(fn.SUM(StatCounter.value))
+            .where((StatCounter.metric == USER_SIGNUPS) & (StatCounter.day >= _days(days)[0]))
+            .scalar()) or 0
+
+
+def timeseries(days: int) -> dict:
+    """最近 days 天的每日新增、各客户端登录和令牌交换，以及各部门人数。"""
+    labels = _days(days)
+    position = {day: i for i, day in enumerate(labels)}
+    signups = [0] * days
+    per_client = {CLIENT_LOGINS: {}, CLIENT_TOKENS: {}}
+
+    for metric, key, day, value in (StatCounter
+                                    .select(StatCounter.metric, StatCounter.key, StatCounter.day, StatCounter.value)
+                                    .where(StatCounter.metric.in_([USER_SIGNUPS, CLIENT_LOGINS, CLIENT_TOKENS])
+                                           & (StatCounter.day >= labels[0]))
+                                    .tuples()):
+        i = position.get(day)
+        if i is None:
+            continue
+        if metric == USER_SIGNUPS:
+            signups[i] += value
+        else:
+            per_client[metric].setdefault(key, [0] * days)[i] += value
+
+    # 尚未写入的本进程增量也计入，仪表盘不必等下一次合并
+    with _pending_lock:
+        pending = list(_pending.items())
+    for (metric, key, day), value in pending:
+        if metric in per_client and day in position:
+            per_client[metric].setdefault(key, [0] * days)[position[day]] += value
+
+    names = dict(Department.select(Department.id, Department.name).tuples())
+    departments = []
+    for key, value in (StatCounter
+                       .select(StatCounter.key, StatCounter.value)
+                       .where(StatCounter.metric == USERS_BY_DEPARTMENT)
+                       .order_by(StatCounter.value.desc())
+                       .tuples()):
+        if value:
+            department_id = int(key) if key else None
+            departments.append({"department_id": department_id, "name": names.get(department_id), "users": value})
+
+    return {
+        "days": labels,
+        "total_users": total_users(),
+        "signups": signups,
+        "logins": per_client[CLIENT_LOGINS],
+        "token_exchanges": per_client[CLIENT_TOKENS],
+        "departments": departments,
+    }
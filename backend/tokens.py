@@ -0,0 +1,57 @@
+# tokens.py
+"""
+JWT 的签发与解析，以及 SSO / 管理员会话 Cookie 的名称和属性。
+
+security（认证依赖）、sessions（管理员会话续期）和登录接口都依赖这里，本模块不导入它们，
+所以这几个模块之间没有循环导入。
+jose（连带 cryptography）的导入开销不小，只在第一次签发或解析令牌时才导入。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "a_very_secret_key_for_sso")
+ALGORITHM = "HS256"
+
+SSO_SESSION_COOKIE = "sso_session_token"
+ADMIN_SESSION_COOKIE = "admin_session_token"
+# 两种会话 Cookie 共用的属性，与 Response.set_cookie 的参数同名
+SESSION_COOKIE_OPTIONS = {"httponly": True, "secure": False, "samesite": "lax"}
+
+
+def create_jwt_token(data: dict, expires_delta: timedelta):
+    from jose import jwt
+
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + expires_delta
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def decode_jwt_token(token: str, verify_audience: bool = True):
+    """
+    解析并校验令牌。默认拒绝带 aud 声明的令牌：访问令牌面向某个客户端，
+    不能当作 SSO 或管理员会话使用；只有 /userinfo 以 verify_audience=False 接受访问令牌。
+    """
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM],
+                             options={"verify_aud": verify_audience})
+        return payload
+    except JWTError:
+        return None
+
+
+def session_cookie_header(key: str, value: str, max_age: int) -> tuple[bytes, bytes]:
+    """
+    生成会话 Cookie 的原始 Set-Cookie 响应头，属性与 Response.set_cookie(**SESSION_COOKIE_OPTIONS) 相同。
+    供不经过 Response 对象、直接在 ASGI 层追加响应头的地方使用；令牌只含 base64url 字符和点，无需转义。
+    """
+    parts = [f"{key}={value}"]
+    if SESSION_COOKIE_OPTIONS["httponly"]:
+        parts.append("HttpOnly")
+    parts += [f"Max-Age={max_age}", "Path=/", f"SameSite={SESSION_COOKIE_OPTIONS['samesite']}"]
+    if SESSION_COOKIE_OPTIONS["secure"]:
+        parts.append("Secure")
+    return b"set-cookie", "; ".join(parts).encode("latin-1")
@@ -0,0 +1,45 @@
+# user_versions.py
+"""
+进程内的用户版本号缓存，供 /api/me 和 /userinfo 处理条件请求。
+
+ETag 由用户 id 和 User.version 组成。客户端带着 If-None-Match 轮询时，只要缓存中的版本号
+仍然有效，就直接返回 304，不访问数据库；缓存过期后只查询 id 和 version 两列。
+本进程内的写操作会主动失效对应条目，其他 worker 的修改最多在 USERINFO_CACHE_SECONDS 秒后可见。
+"""
+import os
+import threading
+import time
+
+USERINFO_CACHE_SECONDS = float(os.environ.get("USERINFO_CACHE_SECONDS", "30"))
+MAX_ENTRIES = 100_000
+
+_versions: dict[str, tuple[int, int, float]] = {}
+_lock = threading.Lock()
+
+
+def make_etag(user_id: int, version: int) -> str:
+    return f'W/"{user_id}.{version}"'
+
+
+def get(username: str) -> tuple[int, int] | None:
+    """返回缓存中仍然有效的 (user_id, version)。"""
+    entry = _versions.get(username)
+    if entry is None or entry[2] < time.monotonic():
+        return None
+    return entry[0], entry[1]
+
+
+def put(username: str, user_id: int, version: int):
+    with _lock:
+        if len(_versions) >= MAX_ENTRIES:
+            _versions.clear()
+        _versions[username] = (user_id, version, time.monotonic() + USERINFO_CACHE_SECONDS)
+
+
+def invalidate(*usernames: str):
+    """失效指定用户；不传参数时清空整个缓存（用于整批 UPDATE）。"""
+    with _lock:
+        if not usernames:
+            _versions.clear()
+        for username in usernames:
+            _versions.pop(username, None)
@@ -1,15 +1,35 @@
 import { NextResponse } from 'next/server';
 import type { NextRequest } from 'next/server';
 
+const ADMIN_SESSION_COOKIE = 'admin_session_token';
+
+// 读取 JWT 的 exp（秒）。签名只有后端能校验，这里只用来尽早发现过期或损坏的会话，
+// 避免页面加载后每个 API 请求都以 401 失败。
+function getTokenExpiry(token: string): number | null {
+  try {
+    const payload = token.split('.')[1];
+    const json = atob(payload.replace(/-/g, '+').replace(/_/g, '/'));
+    const { exp } = JSON.parse(json);
+    return typeof exp === 'number' ? exp : null;
+  } catch {
+    return null;
+  }
+}
+
 export function middleware(request: NextRequest) {
-  // --- 修改这里：检查新的 cookie 名称 ---
-  const adminSessionToken = request.cookies.get('admin_session_token');
+  const adminSessionToken = request.cookies.get(ADMIN_SESSION_COOKIE)?.value;
+  const exp = adminSessionToken ? getTokenExpiry(adminSessionToken) : null;
 
-  // --- 修改这里：使用新的 token 变量 ---
-  if (!adminSessionToken) {
+  // 没有会话、无法解析或已经过期，都跳转到登录页；
+  // 未过期的会话由后端在过半后滑动续期，不需要在这里处理
+  if (!exp || exp * 1000 <= Date.now()) {
     const loginUrl = new URL('/admin/login', request.url);
     loginUrl.searchParams.set('from', request.nextUrl.pathname);
-    return NextResponse.redirect(loginUrl);
+    const response = NextResponse.redirect(loginUrl);
+    if (adminSessionToken) {
+      response.cookies.delete(ADMIN_SESSION_COOKIE);
+    }
+    return response;
   }
 
   return NextResponse.next();
@@ -17,4 +37,4 @@ export function middleware(request: NextRequest) {
 
 export const config = {
   matcher: '/dashboard/:path*',
-};
\ No newline at end of file
+};
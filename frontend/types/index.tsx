@@ -25,5 +25,8 @@ export interface User {
 export interface Platform {
   client_id: string;
   redirect_uri: string;
+  // 全部允许的回调地址（包括 redirect_uri）和允许跨域访问的前端来源
+  redirect_uris?: string[];
+  allowed_origins?: string[];
   client_secret?: string;
 }